@@ -4,10 +4,23 @@ from src.pages.processarImagemPage import ProcessarImagemPage
 from src.pages.consultarRegistroPage import consultarRegistroPage
 from src.pages.debugPage import app as debugApp # 1. ADICIONE ESTA IMPORTAÇÃO
 from src.pages.debugDeteccaoPage import app as debugDeteccaoApp 
+from src.services.ocr import OCR
+from src.config.db import criarTabela
 
 # Configurações globais da aplicação Streamlit:
 st.set_page_config(page_title="Sistema de Reconhecimento de Placas", layout="wide")
 
+# Garante tabela, colunas novas e índice de busca (bancos antigos são atualizados aqui).
+# O Streamlit reexecuta este script a cada interação: o cache_resource faz isso rodar uma vez por processo.
+@st.cache_resource
+def _prepararBanco():
+    criarTabela()
+
+_prepararBanco()
+
+# Pré-carrega os modelos do OCR uma única vez no processo (nas próximas execuções do script é instantâneo).
+OCR.aquecer()
+
 # Lê o parâmetro de querystring ?page=... para decidir qual página mostrar.
 page = st.query_params.get("page", "processar")
 
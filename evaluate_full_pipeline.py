@@ -6,23 +6,27 @@ import random
 from pathlib import Path
 import cv2
 import numpy as np
-from multiprocessing import Pool, cpu_count
+from multiprocessing import Pool, Value, cpu_count
 from tqdm import tqdm
 from shapely.geometry import Polygon
 import functools
+import json
 import logging
 # import sys # Descomente se precisar imprimir erros críticos no stderr
 
 # Importa todos os serviços necessários
-from src.services.preprocessamento import Preprocessamento
-from src.services.bordas import Bordas
-from src.services.contornos import Contornos
-from src.services.filtrarContornos import FiltrarContornos
+from src.services.deteccao import Deteccao
 from src.services.recorte import Recorte
-from src.services.ocr import OCR
+from src.services.ocr import OCR, PoolOCR
+from src.services.detectorHaar import DetectorHaar
 from src.services.montagem import Montagem
 from src.services.validacao import Validacao
 from src.services.analiseCor import AnaliseCor
+from src.services.instrumentacao import Perfil, AgregadorPerfis
+from src.services.cacheEtapas import CacheEtapas, impressaoDeteccao
+
+# Define quantos candidatos tentar no fallback
+NUM_CANDIDATOS_TENTAR = 5
 
 # --- (Funções levenshtein_distance, parse_ground_truth, calculate_iou permanecem iguais) ---
 def levenshtein_distance(s1: str, s2: str) -> int:
@@ -60,10 +64,64 @@ def calculate_iou(quad1: np.ndarray, quad2: np.ndarray) -> float:
 # --- FIM DAS FUNÇÕES HELPER ---
 
 
-def process_single_image_e2e(img_path: Path, iou_threshold: float, blue_threshold: float) -> dict:
+def process_single_image_e2e(img_path: Path, iou_threshold: float, blue_threshold: float, escala_deteccao: float = 1.0, top_k: int = None,
+                             cache_etapas: str = None) -> dict:
     """
     Executa o pipeline completo com fallback inteligente nos top N candidatos.
+    O resultado inclui "perfil" (tempos/contagens por etapa) para o detalhamento no relatório.
+    `cache_etapas`: diretório do CacheEtapas; se dado, detecção + recorte são lidos/gravados lá.
+    """
+    perfil = Perfil()
+    inicio = time.perf_counter()
+    result = _process_single_image_e2e(img_path, iou_threshold, blue_threshold, escala_deteccao, top_k, cache_etapas, perfil)
+    perfil.registrarTempo("total", time.perf_counter() - inicio)
+    result["perfil"] = perfil.exportar()
+    return result
+
+def _detectar_e_recortar(img_path, escala_deteccao, top_k, perfil):
     """
+    Detecção + recorte dos NUM_CANDIDATOS_TENTAR melhores candidatos.
+    Retorna (quads ranqueados, [(rank, crop_bgr)]) ou None se a imagem não puder ser lida.
+    """
+    with perfil.etapa("leitura"):
+        img_bgr = cv2.imread(str(img_path))
+    if img_bgr is None:
+        return None
+
+    candidatos = Deteccao.executar(img_bgr, escala=escala_deteccao, top_k=top_k, perfil=perfil)["candidatos"]
+
+    # Recorta todos os candidatos do fallback (na ordem do ranking)
+    tentativas = []
+    for i, candidate in enumerate(candidatos[:NUM_CANDIDATOS_TENTAR]):
+        candidate_quad = candidate.get("quad")
+        if candidate_quad is None: continue # Pula se não houver quadrilátero
+        try:
+            with perfil.etapa("recorte"):
+                tentativas.append((i, Recorte.executar(img_bgr, candidate_quad)))
+        except Exception as crop_error:
+            print(f"WARN: Erro ao recortar candidato {i+1} para {img_path.name}: {crop_error}")
+    return [c["quad"] for c in candidatos], tentativas
+
+def _detectar_com_cache(img_path, escala_deteccao, top_k, cache_etapas, perfil):
+    """ _detectar_e_recortar passando pelo CacheEtapas (se `cache_etapas` for um diretório). """
+    if not cache_etapas:
+        return _detectar_e_recortar(img_path, escala_deteccao, top_k, perfil)
+    cache = CacheEtapas(cache_etapas)
+    chave = CacheEtapas.chave(img_path, impressaoDeteccao(escala=escala_deteccao, top_k=top_k,
+                                                          candidatos=NUM_CANDIDATOS_TENTAR))
+    with perfil.etapa("cache_etapas"):
+        salvo = cache.carregar(chave)
+    if salvo is not None:
+        perfil.contar("cache_etapas_acertos")
+        return salvo["quads"], salvo["recortes"]
+    perfil.contar("cache_etapas_falhas")
+    deteccao = _detectar_e_recortar(img_path, escala_deteccao, top_k, perfil)
+    if deteccao is not None:
+        with perfil.etapa("cache_etapas"):
+            cache.guardar(chave, *deteccao)
+    return deteccao
+
+def _process_single_image_e2e(img_path, iou_threshold, blue_threshold, escala_deteccao, top_k, cache_etapas, perfil) -> dict:
     txt_path = img_path.with_suffix('.txt')
     ground_truth = parse_ground_truth(txt_path)
     gt_text = ground_truth.get("text")
@@ -80,72 +138,56 @@ def process_single_image_e2e(img_path: Path, iou_threshold: float, blue_threshol
     }
 
     try:
-        img_bgr = cv2.imread(str(img_path))
-        if img_bgr is None:
+        # --- ETAPA 1: DETECÇÃO + RECORTE (ou leitura do cache de etapas) ---
+        deteccao = _detectar_com_cache(img_path, escala_deteccao, top_k, cache_etapas, perfil)
+        if deteccao is None:
             return {**result, "status": "read_error"}
+        quads, tentativas = deteccao
 
-        # --- ETAPA 1: DETECÇÃO (Como antes) ---
-        preproc = Preprocessamento.executar(img_bgr)
-        canny_presets = [(50, 150), (100, 200), (150, 250)]
-        todos_os_contornos = []
-        for (t1, t2) in canny_presets:
-            edges = Bordas.executar(preproc, threshold1=t1, threshold2=t2)
-            contours = Contornos.executar(edges)
-            todos_os_contornos.extend(contours)
-        candidatos = FiltrarContornos.executar(todos_os_contornos, img_bgr)
-
-        if not candidatos:
+        if not quads:
             return result # Mantém status "detection_failed"
 
         # Calcula IoU usando o candidato #1 para a métrica de detecção
-        first_candidate_quad = candidatos[0].get("quad")
-        result["iou_score"] = calculate_iou(first_candidate_quad, gt_quad)
+        result["iou_score"] = calculate_iou(quads[0], gt_quad)
 
-        # --- ETAPA 2: FALLBACK INTELIGENTE (Tenta Top 3 Candidatos) ---
+        # --- ETAPA 2: FALLBACK INTELIGENTE (Tenta Top N Candidatos) ---
         texto_final = None
         montagem_final_primeiro_erro = "" # Guarda o texto lido no 1o erro para o CER
 
-        # Define quantos candidatos tentar (ex: 3)
-        NUM_CANDIDATOS_TENTAR = 5
-
-        for i, candidate in enumerate(candidatos[:NUM_CANDIDATOS_TENTAR]):
-            candidate_quad = candidate.get("quad")
-            if candidate_quad is None: continue # Pula se não houver quadrilátero
-
-            try:
-                crop_bgr = Recorte.executar(img_bgr, candidate_quad)
-                texto_ocr, confiancas = OCR.executarImg(crop_bgr)
+        def _avaliar_leitura(i, crop_bgr, texto_ocr, confiancas):
+            nonlocal montagem_final_primeiro_erro
+            with perfil.etapa("validacao"):
                 montagem_final = Montagem.executar(texto_ocr)
-                
                 # Guarda a leitura do primeiro candidato caso todos falhem
                 if i == 0: montagem_final_primeiro_erro = montagem_final
-
                 placas_validas = Validacao.executar(montagem_final, confiancas)
+            if not placas_validas:
+                perfil.contar("validacao_rejeicoes")
+                return None
+            # Aplica desambiguação por cor
+            with perfil.etapa("cor"):
+                analise_cores = AnaliseCor.executar(crop_bgr)
+            placa, _ = Validacao.desambiguarPorCor(placas_validas, analise_cores.get("percent_azul_superior", 0), blue_threshold)
+            if placa: perfil.contar(f"vencedor_rank_{i+1}")
+            return placa
 
-                if placas_validas: # Encontrou uma leitura válida!
-                    # Aplica desambiguação por cor
-                    analise_cores = AnaliseCor.executar(crop_bgr)
-                    if len(placas_validas) == 1:
-                        texto_final, _ = placas_validas[0]
-                    else:
-                        percent_azul_superior = analise_cores.get("percent_azul_superior", 0)
-                        if percent_azul_superior > blue_threshold:
-                            for placa, padrao in placas_validas:
-                                if padrao == "MERCOSUL": texto_final = placa; break
-                        else:
-                            for placa, padrao in placas_validas:
-                                if padrao == "ANTIGA": texto_final = placa; break
-                        if not texto_final:
-                            texto_final, _ = placas_validas[0] # Fallback
-
-                    # Se encontrou um texto final válido, para o loop
-                    if texto_final:
-                        break # Sai do loop for i, candidate...
-
+        # OCR em lote de todos os recortes (só adianta as leituras); na ordem do ranking, cada candidato
+        # tenta a leitura do lote e, se ela não validar, o OCR completo antes de passar ao próximo
+        with perfil.etapa("ocr_lote"):
+            leituras = OCR.executarLote([crop for _, crop in tentativas])
+        if tentativas: perfil.contar("chamadas_ocr")
+        for (i, crop_bgr), (texto_ocr, confiancas) in zip(tentativas, leituras):
+            try:
+                texto_final = _avaliar_leitura(i, crop_bgr, texto_ocr, confiancas)
+                if texto_final: break # Sai do loop for i, candidate...
+                with perfil.etapa("ocr_completo"):
+                    texto_ocr, confiancas = OCR.executarImg(crop_bgr, modo="completo")
+                perfil.contar("chamadas_ocr")
+                texto_final = _avaliar_leitura(i, crop_bgr, texto_ocr, confiancas)
+                if texto_final: break
             except Exception as crop_ocr_error:
-                # Se o recorte ou OCR falhar para um candidato, apenas loga e tenta o próximo
+                # Se o OCR falhar para um candidato, apenas loga e tenta o próximo
                 print(f"WARN: Erro ao processar candidato {i+1} para {img_path.name}: {crop_ocr_error}")
-                continue
 
         # --- ETAPA 3: CÁLCULO FINAL DAS MÉTRICAS ---
         if texto_final: # Se o loop encontrou uma placa válida
@@ -167,11 +209,190 @@ def process_single_image_e2e(img_path: Path, iou_threshold: float, blue_threshol
         # Erros gerais fora do loop de fallback
         return {**result, "status": "critical_error", "error": str(e)}
 
+# --- MODO VARREDURA (--sweep): registra tudo por candidato uma vez e avalia a grade de parâmetros offline ---
+
+def registrar_candidatos_e2e(img_path: Path, escala_deteccao: float = 1.0, top_k: int = None, cache_etapas: str = None) -> dict:
+    """
+    Para a varredura: roda detecção + recorte e, para CADA candidato do fallback (até
+    NUM_CANDIDATOS_TENTAR), registra a leitura do OCR em lote e do OCR completo, as opções
+    da Validacao de cada uma e a métrica de cor, com os tempos necessários para estimar a latência.
+    """
+    gt = parse_ground_truth(img_path.with_suffix('.txt'))
+    registro = {"arquivo": img_path.name, "gt_text": gt.get("text"), "status": "ok", "candidatos": []}
+    if gt.get("text") is None or gt.get("quad") is None:
+        return {**registro, "status": "no_ground_truth"}
+
+    perfil = Perfil()
+    try:
+        inicio = time.perf_counter()
+        deteccao = _detectar_com_cache(img_path, escala_deteccao, top_k, cache_etapas, perfil)
+        registro["deteccao_ms"] = (time.perf_counter() - inicio) * 1000.0
+        if deteccao is None:
+            return {**registro, "status": "read_error"}
+        _, tentativas = deteccao
+
+        def _opcoes(texto_ocr, confiancas):
+            inicio_val = time.perf_counter()
+            opcoes = Validacao.executar(Montagem.executar(texto_ocr), confiancas)
+            return [list(o) for o in opcoes], (time.perf_counter() - inicio_val) * 1000.0
+
+        inicio = time.perf_counter()
+        leituras = OCR.executarLote([crop for _, crop in tentativas])
+        registro["lote_ms"] = (time.perf_counter() - inicio) * 1000.0
+        for (i, crop_bgr), (texto_lote, conf_lote) in zip(tentativas, leituras):
+            inicio = time.perf_counter()
+            azul = AnaliseCor.executar(crop_bgr).get("percent_azul_superior", 0)
+            cor_ms = (time.perf_counter() - inicio) * 1000.0
+            opcoes_lote, val_lote_ms = _opcoes(texto_lote, conf_lote)
+            inicio = time.perf_counter()
+            texto_comp, conf_comp = OCR.executarImg(crop_bgr, modo="completo")
+            completo_ms = (time.perf_counter() - inicio) * 1000.0
+            opcoes_comp, val_comp_ms = _opcoes(texto_comp, conf_comp)
+            registro["candidatos"].append({
+                "rank": i, "azul": float(azul), "cor_ms": cor_ms,
+                "lote": {"texto": texto_lote, "opcoes": opcoes_lote, "validacao_ms": val_lote_ms},
+                "completo": {"texto": texto_comp, "opcoes": opcoes_comp, "validacao_ms": val_comp_ms, "ms": completo_ms},
+            })
+    except Exception as e:
+        return {**registro, "status": "critical_error", "error": str(e)}
+    return registro
+
+def _parse_grade(texto: str) -> list:
+    """ "0.05:0.30:0.01" (início:fim:passo, fim incluso) ou lista "0.1,0.12,0.2". """
+    if ":" in texto:
+        inicio, fim, passo = (float(x) for x in texto.split(":"))
+        return [round(v, 6) for v in np.arange(inicio, fim + passo / 2, passo)]
+    return [float(x) for x in texto.split(",") if x.strip()]
+
+def avaliar_grade(registros: list, limiares: list, profundidades: list) -> list:
+    """
+    Reproduz offline a lógica de fallback do pipeline (nos N primeiros candidatos, em ordem: leitura
+    do lote e, se não validar, OCR completo; desempate MERCOSUL/ANTIGA pela cor) para cada combinação
+    (limiar de azul, profundidade N), vetorizado com numpy sobre imagens e limiares.
+    Retorna uma linha por combinação: acurácia, falhas de OCR, latência estimada e chamadas de OCR.
+    """
+    registros = [r for r in registros if r.get("status") == "ok"]
+    N, J, T = len(registros), NUM_CANDIDATOS_TENTAR, len(limiares)
+    if N == 0: return []
+    limiar = np.asarray(limiares, dtype=np.float64)[:, None, None]        # (T,1,1)
+
+    existe = np.zeros((N, J), bool)
+    azul, cor_ms = np.zeros((N, J)), np.zeros((N, J))
+    deteccao_ms = np.array([r.get("deteccao_ms", 0.0) for r in registros])
+    lote_ms_por_recorte = np.array([r.get("lote_ms", 0.0) / max(1, len(r["candidatos"])) for r in registros])
+    modos = {}
+    for modo in ("lote", "completo"):
+        modos[modo] = {k: np.zeros((N, J), bool) for k in ("valido", "unica", "acerto_unica", "acerto_merc", "acerto_antiga")}
+        modos[modo]["val_ms"] = np.zeros((N, J))
+        modos[modo]["ms"] = np.zeros((N, J))
+    for n, r in enumerate(registros):
+        for c in r["candidatos"]:
+            j = c["rank"]
+            if j >= J: continue
+            existe[n, j], azul[n, j], cor_ms[n, j] = True, c["azul"], c["cor_ms"]
+            for modo, m in modos.items():
+                opcoes = c[modo]["opcoes"]
+                m["val_ms"][n, j], m["ms"][n, j] = c[modo]["validacao_ms"], c[modo].get("ms", 0.0)
+                if not opcoes: continue
+                m["valido"][n, j] = True
+                m["unica"][n, j] = len(opcoes) == 1
+                m["acerto_unica"][n, j] = opcoes[0][0] == r["gt_text"]
+                por_padrao = {padrao: placa for placa, padrao in opcoes}
+                m["acerto_merc"][n, j] = por_padrao.get("MERCOSUL") == r["gt_text"]
+                m["acerto_antiga"][n, j] = por_padrao.get("ANTIGA") == r["gt_text"]
+
+    # Acerto de cada candidato em cada modo, para cada limiar: (T, N, J)
+    acerto = {}
+    for modo, m in modos.items():
+        por_cor = np.where(azul[None] > limiar, m["acerto_merc"][None], m["acerto_antiga"][None])
+        acerto[modo] = np.where(m["unica"][None], m["acerto_unica"][None], por_cor) & m["valido"][None]
+
+    linhas = []
+    idx_n = np.arange(N)
+    for profundidade in profundidades:
+        d = max(1, min(int(profundidade), J))
+        janela = np.zeros((N, J), bool); janela[:, :d] = True
+        tentados = existe & janela
+        valido_lote = modos["lote"]["valido"] & tentados
+        valido_comp = modos["completo"]["valido"] & tentados
+        # Na ordem do ranking, cada candidato tenta o lote e, se não validar, o OCR completo:
+        # vence o primeiro candidato válido em qualquer um dos dois (o lote tem prioridade nele)
+        valido = valido_lote | valido_comp
+        tem = valido.any(axis=1)
+        w = valido.argmax(axis=1)                                                  # primeiro válido
+        pelo_lote = valido_lote[idx_n, w]
+
+        acerto_final = np.where(tem[None], np.where(pelo_lote[None], acerto["lote"][:, idx_n, w],
+                                                    acerto["completo"][:, idx_n, w]), False)  # (T, N)
+
+        # Latência estimada (não depende do limiar): detecção + lote + validações/cor até o vencedor
+        # (+ OCR completo nos candidatos cuja leitura do lote não validou)
+        recortes = tentados.sum(axis=1)
+        ate_vencedor = tentados & (np.arange(J)[None, :] <= np.where(tem, w, d - 1)[:, None])
+        roda_comp = ate_vencedor & ~valido_lote
+        custo_lote = (modos["lote"]["val_ms"] + valido_lote * cor_ms) * ate_vencedor
+        custo_comp = (modos["completo"]["ms"] + modos["completo"]["val_ms"] + valido_comp * cor_ms) * roda_comp
+        latencia = deteccao_ms + lote_ms_por_recorte * recortes + custo_lote.sum(axis=1) + custo_comp.sum(axis=1)
+        chamadas = (recortes > 0) + roda_comp.sum(axis=1)
+
+        for t, valor in enumerate(limiares):
+            linhas.append({
+                "blue_threshold": valor, "profundidade": d,
+                "acuracia": 100.0 * acerto_final[t].mean(),
+                "falhas_ocr": 100.0 * (~tem & (recortes > 0)).mean(),
+                "latencia_media_ms": float(latencia.mean()),
+                "latencia_p95_ms": float(np.percentile(latencia, 95)),
+                "chamadas_ocr": float(chamadas.mean()),
+            })
+    return linhas
+
+def formatar_grade(linhas: list) -> str:
+    cabecalho = f"{'Prof.':>5} {'Blue thr':>9} {'Acurácia %':>11} {'Falha OCR %':>12} {'Lat. média ms':>14} {'Lat. p95 ms':>12} {'OCR/img':>8}"
+    saida = [cabecalho, "-" * len(cabecalho)]
+    for l in linhas:
+        saida.append(f"{l['profundidade']:>5} {l['blue_threshold']:>9.3f} {l['acuracia']:>11.2f} {l['falhas_ocr']:>12.2f} "
+                     f"{l['latencia_media_ms']:>14.1f} {l['latencia_p95_ms']:>12.1f} {l['chamadas_ocr']:>8.2f}")
+    return "\n".join(saida)
+
+def _limitar_threads(threads: int):
+    # Só o que ainda pode ser ajustado em tempo de execução: numpy e Paddle já foram importados
+    # no topo deste script (antes do fork), então OMP_NUM_THREADS/MKL_NUM_THREADS/OPENBLAS_NUM_THREADS
+    # escritos aqui não teriam efeito. As threads do Paddle são fixadas pelo cpu_threads do PoolOCR;
+    # para limitar o BLAS do numpy, exporte essas variáveis antes de rodar o script.
+    cv2.setNumThreads(threads)
+
+def _inicializar_worker(threads: int, prontos):
+    """
+    Roda uma vez em cada processo do Pool, antes da primeira imagem:
+    fixa o número de threads internas do OpenCV e do Paddle (senão são N processos x N threads
+    disputando os mesmos núcleos), carrega o Haar e o PaddleOCR e faz uma inferência de aquecimento.
+    """
+    try:
+        _limitar_threads(threads)
+        PoolOCR.configurar(tamanho=1, cpu_threads=threads)
+        DetectorHaar.carregar()
+        OCR.aquecer(1)
+    finally:
+        with prontos.get_lock():
+            prontos.value += 1
+
+def _iniciar_pool(processos: int, threads: int):
+    """ Cria o Pool e só retorna quando todos os workers terminaram de carregar os modelos. """
+    prontos = Value('i', 0)
+    pool = Pool(processes=processos, initializer=_inicializar_worker, initargs=(threads, prontos))
+    inicio = time.time()
+    while prontos.value < processos:
+        time.sleep(0.05)
+    print(f"[INFO] {processos} workers prontos ({threads} thread(s) cada) em {time.time() - inicio:.1f}s (fora da medição).")
+    return pool
+
 # --- (Função run_full_pipeline_evaluation permanece a mesma da v3.3/v3.7) ---
 # ... (cole a função da versão anterior aqui) ...
 def run_full_pipeline_evaluation(args):
     print("--- Iniciando Avaliação de Pipeline Completo (Métricas Avançadas) ---")
     print(f"[INFO] Usando Blue Threshold: {args.blue_threshold:.2f}") # Informa o threshold usado
+    print(f"[INFO] Escala de detecção: {args.escala_deteccao:.2f} | Top-K pontuados: {args.top_k or 'todos'}")
+    if args.cache_etapas: print(f"[INFO] Cache de etapas em: {args.cache_etapas}")
     dataset_dir = Path(args.dataset_path)
     image_files = list(dataset_dir.glob('*.jpg')) + list(dataset_dir.glob('*.jpeg')) + list(dataset_dir.glob('*.png'))
     if args.random:
@@ -179,16 +400,26 @@ def run_full_pipeline_evaluation(args):
         image_files = random.sample(image_files, min(args.random, len(image_files)))
     total_images = len(image_files)
     if total_images == 0: print("Nenhuma imagem para processar."); return
-    print(f"Total de imagens para processar: {total_images}. Usando {cpu_count()} processadores.")
+    processos = args.processos or cpu_count()
+    threads = args.threads_por_worker or max(1, cpu_count() // processos)
+    # Lotes de imagens por envio ao worker: menos idas e vindas de IPC, mas ainda pequenos
+    # o bastante para balancear a carga entre os processos no fim da execução
+    chunksize = args.chunksize or max(1, min(16, total_images // (processos * 4)))
+    print(f"Total de imagens para processar: {total_images}. Usando {processos} processos (chunksize {chunksize}).")
+    _limitar_threads(threads)
+    pool = _iniciar_pool(processos, threads)
     start_time = time.time()
     
     # Passa o blue_threshold para a função de processamento
     partial_process_func = functools.partial(process_single_image_e2e,
                                              iou_threshold=args.iou_threshold,
-                                             blue_threshold=args.blue_threshold)
+                                             blue_threshold=args.blue_threshold,
+                                             escala_deteccao=args.escala_deteccao,
+                                             top_k=args.top_k,
+                                             cache_etapas=args.cache_etapas)
     results = []
-    with Pool(processes=cpu_count()) as pool:
-        for result in tqdm(pool.imap_unordered(partial_process_func, image_files), total=total_images, desc="Processando Imagens"):
+    with pool:
+        for result in tqdm(pool.imap_unordered(partial_process_func, image_files, chunksize=chunksize), total=total_images, desc="Processando Imagens"):
             results.append(result)
     end_time = time.time()
     total_time = end_time - start_time
@@ -231,6 +462,18 @@ def run_full_pipeline_evaluation(args):
     print(f"Tempo total de processamento: {total_time:.2f} segundos")
     print(f"1.1. Latência Média por Imagem: {latency_avg:.4f} segundos/imagem")
     print(f"1.2. Frames Por Segundo (FPS): {throughput_fps:.2f} FPS")
+    agregador = AgregadorPerfis()
+    for res in results: agregador.registrar(res.get("perfil"))
+    resumo_perfis = agregador.resumo()
+    print("\n--- Detalhamento por Etapa (tempo de parede dentro de cada worker) ---")
+    print(agregador.formatarTabela())
+    contadores = resumo_perfis["contadores"]
+    print(f"Chamadas de OCR: {contadores.get('chamadas_ocr', 0)} | Rejeições da Validação: {contadores.get('validacao_rejeicoes', 0)}")
+    if args.cache_etapas:
+        print(f"Cache de etapas: {contadores.get('cache_etapas_acertos', 0)} acertos | {contadores.get('cache_etapas_falhas', 0)} falhas")
+    print(f"Candidatos gerados: {contadores.get('candidatos_gerados', 0)} | Podados (NMS): {contadores.get('candidatos_podados_nms', 0)} | Pontuados: {contadores.get('candidatos_pontuados', 0)}")
+    ranks = sorted((int(k.rsplit('_', 1)[1]), v) for k, v in contadores.items() if k.startswith("vencedor_rank_"))
+    print("Rank do candidato vencedor: " + (", ".join(f"#{r}: {n}" for r, n in ranks) or "nenhum"))
     print("\n--- Relatório de Métricas de Precisão (Qualidade) ---")
     print(f"2.1. Acurácia End-to-End: {correct_reads}/{total_processed} ({e2e_accuracy:.2f}%)")
     print(f"2.2. Acurácia da Detecção (IoU >= {args.iou_threshold}): {correct_detections_iou}/{total_processed} ({detection_accuracy_iou:.2f}%)")
@@ -249,15 +492,72 @@ def run_full_pipeline_evaluation(args):
             f.writelines([f"{line}\n" for line in error_log])
         print(f"\n[INFO] Relatório detalhado de erros salvo em: '{log_path}'")
 
+def run_sweep(args):
+    """ Modo varredura: registra (ou carrega) os candidatos de cada imagem e avalia a grade offline. """
+    print("--- Varredura de Parâmetros (blue_threshold x profundidade do fallback) ---")
+    if args.sweep_carregar:
+        with open(args.sweep_carregar, 'r', encoding='utf-8') as f:
+            registros = json.load(f)
+        print(f"[INFO] {len(registros)} registros carregados de '{args.sweep_carregar}' (sem rodar OCR).")
+    else:
+        dataset_dir = Path(args.dataset_path)
+        image_files = list(dataset_dir.glob('*.jpg')) + list(dataset_dir.glob('*.jpeg')) + list(dataset_dir.glob('*.png'))
+        if args.random:
+            image_files = random.sample(image_files, min(args.random, len(image_files)))
+        if not image_files: print("Nenhuma imagem para processar."); return
+        processos = args.processos or cpu_count()
+        threads = args.threads_por_worker or max(1, cpu_count() // processos)
+        chunksize = args.chunksize or max(1, min(16, len(image_files) // (processos * 4)))
+        _limitar_threads(threads)
+        pool = _iniciar_pool(processos, threads)
+        funcao = functools.partial(registrar_candidatos_e2e, escala_deteccao=args.escala_deteccao,
+                                   top_k=args.top_k, cache_etapas=args.cache_etapas)
+        registros = []
+        with pool:
+            for registro in tqdm(pool.imap_unordered(funcao, image_files, chunksize=chunksize), total=len(image_files), desc="Registrando Candidatos"):
+                registros.append(registro)
+        if args.sweep_salvar:
+            with open(args.sweep_salvar, 'w', encoding='utf-8') as f:
+                json.dump(registros, f)
+            print(f"[INFO] Registros salvos em '{args.sweep_salvar}' (reavalie com --sweep_carregar).")
+
+    limiares = _parse_grade(args.sweep_blue)
+    profundidades = [int(p) for p in _parse_grade(args.sweep_profundidades)]
+    inicio = time.time()
+    linhas = avaliar_grade(registros, limiares, profundidades)
+    validos = sum(1 for r in registros if r.get("status") == "ok")
+    print(f"[INFO] {len(linhas)} combinações avaliadas sobre {validos} imagens em {time.time() - inicio:.2f}s.\n")
+    print(formatar_grade(linhas))
+    if linhas:
+        melhor = max(linhas, key=lambda l: (l["acuracia"], -l["latencia_media_ms"]))
+        print(f"\nMelhor acurácia: {melhor['acuracia']:.2f}% com blue_threshold={melhor['blue_threshold']:.3f}, "
+              f"profundidade={melhor['profundidade']} (latência média estimada {melhor['latencia_media_ms']:.1f} ms)")
+
 if __name__ == "__main__":
     # logging.getLogger('ppocr').setLevel(logging.ERROR) # Removido - aceitamos o spam por enquanto
     parser = argparse.ArgumentParser(description="Script para avaliar a precisão do pipeline completo de ALPR com fallback.")
-    parser.add_argument("dataset_path", help="Caminho para a pasta contendo as imagens e os arquivos .txt.")
+    parser.add_argument("dataset_path", nargs="?", default=None, help="Caminho para a pasta contendo as imagens e os arquivos .txt.")
     parser.add_argument("--iou_threshold", type=float, default=0.1, help="Limiar de IoU para detecção correta. Padrão: 0.1")
     parser.add_argument("--blue_threshold", type=float, default=0.12, help="Limiar de azul superior para Mercosul. Padrão: 0.12") # Mantendo 0.12
+    parser.add_argument("--escala_deteccao", type=float, default=1.0, help="Fator de redução da imagem na etapa de detecção (ex: 0.5). Padrão: 1.0 (resolução cheia)")
+    parser.add_argument("--top_k", type=int, default=None, help="Pontua (segmentação/cor) só os K melhores candidatos pelo ranking geométrico. Padrão: todos")
+    parser.add_argument("--cache_etapas", metavar="DIR", default=None, help="Diretório do cache de detecção/recorte: execuções seguintes começam no OCR. Padrão: desligado")
+    parser.add_argument("--processos", type=int, default=None, help="Número de processos do Pool. Padrão: número de CPUs")
+    parser.add_argument("--threads_por_worker", type=int, default=None, help="Threads internas (Paddle/OpenCV) por processo. Padrão: CPUs / processos")
+    parser.add_argument("--chunksize", type=int, default=None, help="Imagens enviadas por vez a cada worker. Padrão: automático (até 16)")
     parser.add_argument("-r", "--random", type=int, metavar='N', help="Executa o teste em N imagens aleatórias.")
+    parser.add_argument("--sweep", action="store_true", help="Modo varredura: avalia a grade de blue_threshold x profundidade do fallback com um único OCR por candidato.")
+    parser.add_argument("--sweep_blue", default="0.05:0.30:0.01", help="Grade de blue_threshold (início:fim:passo ou lista). Padrão: 0.05:0.30:0.01")
+    parser.add_argument("--sweep_profundidades", default=",".join(str(p) for p in range(1, NUM_CANDIDATOS_TENTAR + 1)), help="Profundidades do fallback a avaliar. Padrão: 1 até NUM_CANDIDATOS_TENTAR")
+    parser.add_argument("--sweep_salvar", metavar="ARQUIVO", default=None, help="Salva os registros por candidato (JSON) para reavaliar depois.")
+    parser.add_argument("--sweep_carregar", metavar="ARQUIVO", default=None, help="Reavalia a grade a partir de registros salvos (não precisa do dataset).")
     parser.add_argument("--save-log", action="store_true", help="Salva um relatório detalhado das falhas.")
     args = parser.parse_args()
+    if args.dataset_path is None and not args.sweep_carregar:
+        parser.error("dataset_path é obrigatório (exceto com --sweep --sweep_carregar).")
+    if args.sweep or args.sweep_carregar:
+        run_sweep(args)
+        raise SystemExit(0)
     if args.iou_threshold != 0.1: print(f"[INFO] Usando IoU Threshold: {args.iou_threshold}")
     else: print(f"[INFO] Usando IoU Threshold padrão otimizado: 0.1")
     run_full_pipeline_evaluation(args)
\ No newline at end of file
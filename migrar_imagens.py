@@ -0,0 +1,70 @@
+import argparse
+
+from sqlalchemy import text
+
+from src.config.db import SessionLocal, engine, criarTabela
+from src.models.acessoModel import TabelaAcesso
+from src.services.armazenamentoImagens import ArmazenamentoImagens
+
+# Migra bancos antigos: as imagens guardadas como BLOB na tabela "acessos" vão para o
+# ArmazenamentoImagens (arquivos nomeados pelo sha256, sem duplicatas) e o registro
+# passa a guardar só os hashes. Pode ser executado mais de uma vez (só pega o que falta).
+#
+# Uso: python migrar_imagens.py [--lote 200] [--sem-vacuum]
+
+COLUNAS = [
+    # (tipo no armazenamento, coluna BLOB legada, coluna de hash)
+    ("source", "source_image", "source_hash"),
+    ("crop", "plate_crop_image", "crop_hash"),
+    ("annotated", "annotated_image", "annotated_hash"),
+]
+
+
+def migrar(tamanho_lote: int = 200) -> int:
+    criarTabela()  # garante as colunas de hash em bancos antigos
+    pendentes = (TabelaAcesso.source_image.isnot(None) | TabelaAcesso.plate_crop_image.isnot(None)
+                 | TabelaAcesso.annotated_image.isnot(None))
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            # Sempre pega o primeiro lote pendente: os já migrados deixam de casar com o filtro
+            registros = db.query(TabelaAcesso).filter(pendentes).order_by(TabelaAcesso.id).limit(tamanho_lote).all()
+            if not registros:
+                break
+            for r in registros:
+                for tipo, coluna_blob, coluna_hash in COLUNAS:
+                    dados = getattr(r, coluna_blob)
+                    if dados:
+                        setattr(r, coluna_hash, ArmazenamentoImagens.salvar(tipo, dados))
+                    setattr(r, coluna_blob, None)
+            db.commit()
+            total += len(registros)
+            print(f"[INFO] {total} registros migrados...")
+    except Exception as e:
+        db.rollback()
+        print(f"[ERRO] Erro na migração: {e}")
+        raise
+    finally:
+        db.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move as imagens (BLOB) do banco para o armazenamento em disco.")
+    parser.add_argument("--lote", type=int, default=200, help="Registros por commit.")
+    parser.add_argument("--sem-vacuum", action="store_true",
+                        help="Não executa VACUUM ao final (o arquivo do banco não encolhe).")
+    args = parser.parse_args()
+
+    total = migrar(args.lote)
+    print(f"[INFO] Migração concluída: {total} registros.")
+    if total and not args.sem_vacuum:
+        # Devolve ao sistema de arquivos as páginas que os BLOBs ocupavam
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        print("[INFO] VACUUM executado.")
+
+
+if __name__ == "__main__":
+    main()
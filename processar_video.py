@@ -0,0 +1,55 @@
+import argparse
+from datetime import datetime
+
+from src.config.db import criarTabela
+from src.controllers.placaController import PlacaController
+from src.services.ocr import OCR
+from src.services.persistencia import EscritorPersistencia
+from src.services.metricas import servirMetricas
+
+# Reconhecimento contínuo a partir de vídeo: arquivo, câmera V4L2 (índice "0" ou /dev/videoN)
+# ou URL de stream. Só os frames com movimento passam pela detecção; cada placa é acompanhada
+# entre os frames e gravada no banco UMA vez por veículo, com a leitura votada entre os frames.
+#
+# Uso: python processar_video.py portao.mp4 [--amostragem 2] [--escala_deteccao 0.5]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lê placas de um vídeo ou câmera.")
+    parser.add_argument("fonte", help="Arquivo de vídeo, índice/caminho da câmera (ex.: 0, /dev/video0) ou URL.")
+    parser.add_argument("--amostragem", type=int, default=1, help="Processa 1 a cada N frames lidos.")
+    parser.add_argument("--escala_deteccao", type=float, default=1.0,
+                        help="Fator de redução usado só na detecção (ex.: 0.5 para 1080p).")
+    parser.add_argument("--fila", type=int, default=4,
+                        help="Frames aguardando o pipeline; em fontes ao vivo o mais antigo é descartado.")
+    parser.add_argument("--sem_movimento", action="store_true", help="Desliga o filtro de movimento.")
+    parser.add_argument("--fracao_movimento", type=float, default=0.01,
+                        help="Fração mínima de pixels alterados para o frame ser processado.")
+    parser.add_argument("--inicio", type=datetime.fromisoformat, default=None,
+                        help="Início da gravação de um arquivo (ISO 8601, ex.: 2024-05-10T08:00:00); a data de "
+                             "cada placa é este instante + a posição no vídeo. Padrão: a hora em que começou a leitura.")
+    parser.add_argument("--porta_metricas", type=int, default=None,
+                        help="Expõe GET /metrics (formato Prometheus) nesta porta enquanto o vídeo é processado.")
+    args = parser.parse_args()
+
+    criarTabela()
+    OCR.aquecer()
+    if args.porta_metricas:
+        servirMetricas(args.porta_metricas)
+
+    def _mostrar(resultado):
+        print(f"[INFO] Veículo {resultado['trilha']}: {resultado['texto_final']} ({resultado['padrao']}), "
+              f"frames {resultado['primeiro_frame']}-{resultado['ultimo_frame']}, {resultado['leituras']} leitura(s)")
+
+    estatisticas = PlacaController.processarVideo(
+        args.fonte, on_resultado=_mostrar, escala_deteccao=args.escala_deteccao, amostragem=args.amostragem,
+        movimento=not args.sem_movimento, fila_max=args.fila, inicio=args.inicio, fracao_minima=args.fracao_movimento)
+    EscritorPersistencia.instancia().esvaziar()
+
+    print("\n--- Resumo ---")
+    for nome, valor in estatisticas.items():
+        print(f"{nome:>18}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import io
+import os
+import argparse
+import zipfile
+from datetime import datetime
+
+from flask import Flask, Response, jsonify, request
+
+from src.config.db import criarTabela
+from src.services.metricas import Metricas
+from src.services.poolInferencia import (PoolInferencia, FilaCheia, PROCESSOS_PADRAO, THREADS_POR_WORKER_PADRAO,
+                                         FILA_MAX_PADRAO)
+
+# Serviço HTTP de reconhecimento (sem interface): várias câmeras/clientes mandam imagens para
+# a mesma máquina. As imagens são processadas por um pool de processos com o OCR já carregado;
+# se a fila estiver cheia a resposta é 429 (tente de novo em instantes).
+#
+# Uso: python servidor.py [--porta 8000] [--processos 4] [--fila_max 32]
+#
+#   curl -F imagem=@carro.jpg http://localhost:8000/recognize
+#   curl -F imagens=@a.jpg -F imagens=@b.jpg http://localhost:8000/recognize/batch
+#   curl -F imagens=@fotos.zip http://localhost:8000/recognize/batch
+#   curl http://localhost:8000/metrics   (formato texto do Prometheus)
+#
+# Parâmetros opcionais (query string ou formulário): escala (detecção), data (ISO 8601, data da captura).
+# Requisições acima de SERVIDOR_MAX_REQUISICAO_MB e zips acima de SERVIDOR_MAX_ZIP_MB (descompactado) recebem 413.
+
+EXTENSOES_IMAGEM = (".jpg", ".jpeg", ".png", ".bmp")
+# Limites de upload (a requisição é recusada com 413 antes de ser lida/descompactada):
+# - SERVIDOR_MAX_REQUISICAO_MB: tamanho máximo do corpo da requisição
+# - SERVIDOR_MAX_ZIP_MB: soma dos tamanhos DESCOMPACTADOS das imagens de um .zip
+MAX_REQUISICAO_BYTES = int(float(os.environ.get("SERVIDOR_MAX_REQUISICAO_MB", "64")) * 1024 * 1024)
+MAX_ZIP_BYTES = int(float(os.environ.get("SERVIDOR_MAX_ZIP_MB", "256")) * 1024 * 1024)
+
+app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUISICAO_BYTES
+POOL = None
+
+
+class LoteGrande(Exception):
+    """ O lote passa do número de imagens ou do tamanho aceitos (resposta 413). """
+
+
+def _parametros():
+    """ (escala_deteccao, data_capturada) da requisição; ValueError se vierem inválidos. """
+    escala = float(request.values.get("escala", 1.0))
+    if not 0 < escala <= 1:
+        raise ValueError("escala deve estar em (0, 1]")
+    data = request.values.get("data")
+    return escala, datetime.fromisoformat(data) if data else None
+
+
+def _ehZip(nome, dados):
+    return (nome or "").lower().endswith(".zip") or dados[:4] == b"PK\x03\x04"
+
+
+def _extrairZip(dados, vagas: int):
+    """ Imagens do zip; os limites são conferidos no diretório do zip, antes de descompactar qualquer membro. """
+    with zipfile.ZipFile(io.BytesIO(dados)) as arquivo_zip:
+        membros = [info for info in arquivo_zip.infolist()
+                   if not info.is_dir() and info.filename.lower().endswith(EXTENSOES_IMAGEM)]
+        if len(membros) > vagas:
+            raise LoteGrande(f"o lote tem mais de {POOL.fila_max} imagens")
+        tamanho = sum(info.file_size for info in membros)
+        if tamanho > MAX_ZIP_BYTES:
+            raise LoteGrande(f"o zip descompactado tem {tamanho} bytes; o máximo é {MAX_ZIP_BYTES}")
+        return [(info.filename, arquivo_zip.read(info)) for info in membros]
+
+
+def _formatar(nome, resultado):
+    """ Resposta de uma imagem: placa, padrão, quad e tempos por etapa (ms). """
+    resposta = {"arquivo": nome, "status": resultado["status"]}
+    if resultado["status"] == "erro" and "erro" in resultado:
+        resposta["erro"] = resultado["erro"]
+        return resposta
+    etapas = resultado["perfil"]["etapas"]
+    resposta.update({
+        "placa": resultado["placa"],
+        "padrao": resultado["padrao"],
+        "quad": resultado["quad"],
+        "cache": resultado["cache"],
+        "tempos_ms": {nome_etapa: round(e["tempo_ms"], 2) for nome_etapa, e in etapas.items()},
+    })
+    return resposta
+
+
+def _responder(imagens):
+    """ imagens: lista de (nome, bytes). """
+    try:
+        escala, data_capturada = _parametros()
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    try:
+        resultados = POOL.reconhecer([dados for _, dados in imagens], escala_deteccao=escala,
+                                     data_capturada=data_capturada)
+    except FilaCheia as e:
+        resposta = jsonify({"erro": f"Servidor ocupado: {e}"})
+        resposta.headers["Retry-After"] = "1"
+        return resposta, 429
+    return [_formatar(nome, r) for (nome, _), r in zip(imagens, resultados)], 200
+
+
+@app.post("/recognize")
+def reconhecer():
+    arquivo = next(iter(request.files.values()), None)
+    dados = arquivo.read() if arquivo is not None else request.get_data()
+    if not dados:
+        return jsonify({"erro": "Envie a imagem como arquivo (multipart) ou no corpo da requisição."}), 400
+    resultados, codigo = _responder([(arquivo.filename if arquivo is not None else None, dados)])
+    if codigo != 200:
+        return resultados, codigo
+    return jsonify(resultados[0])
+
+
+@app.post("/recognize/batch")
+def reconhecerLote():
+    imagens = []
+    envios = [(a.filename, a.read()) for a in request.files.values()] if request.files else \
+        [(None, request.get_data())]
+    try:
+        for nome, dados in envios:
+            if not dados: continue
+            imagens.extend(_extrairZip(dados, POOL.fila_max - len(imagens)) if _ehZip(nome, dados) else [(nome, dados)])
+            if len(imagens) > POOL.fila_max:
+                raise LoteGrande(f"o lote tem mais de {POOL.fila_max} imagens")
+    except zipfile.BadZipFile as e:
+        return jsonify({"erro": f"Arquivo zip inválido: {e}"}), 400
+    except LoteGrande as e:
+        return jsonify({"erro": f"Lote recusado: {e}."}), 413
+    if not imagens:
+        return jsonify({"erro": "Nenhuma imagem enviada (arquivos multipart ou um .zip)."}), 400
+    resultados, codigo = _responder(imagens)
+    if codigo != 200:
+        return resultados, codigo
+    return jsonify({"resultados": resultados})
+
+
+@app.get("/health")
+def saude():
+    """ 200 com o pool inteiro pronto; 503 se algum worker falhou ao inicializar (ex.: modelo do OCR). """
+    resposta = {"processos": POOL.processos, "prontos": POOL.prontos(), "fila": POOL.profundidade(),
+                "fila_max": POOL.fila_max, **POOL.estatisticas}
+    if not POOL.saudavel():
+        resposta["falhas_inicializacao"] = {str(pid): erro for pid, erro in POOL.falhas_inicializacao.items()}
+        return jsonify(resposta), 503
+    return jsonify(resposta)
+
+
+@app.get("/metrics")
+def metricas():
+    m = Metricas().adicionarAgregador().adicionarProcessos(POOL.estatisticasWorkers())
+    m.amostra("servidor_fila", "gauge", "Imagens aceitas ainda não concluídas.", POOL.profundidade())
+    m.amostra("servidor_fila_max", "gauge", "Imagens pendentes aceitas antes de responder 429.", POOL.fila_max)
+    for resultado, valor in POOL.estatisticas.items():
+        m.amostra("servidor_imagens_total", "counter", "Imagens recebidas pelo servidor, por desfecho.",
+                  valor, {"resultado": resultado})
+    return Response(m.texto(), content_type=Metricas.TIPO_CONTEUDO)
+
+
+def main():
+    global POOL
+    parser = argparse.ArgumentParser(description="Serviço HTTP de reconhecimento de placas.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--processos", type=int, default=PROCESSOS_PADRAO, help="Processos de inferência.")
+    parser.add_argument("--threads_por_worker", type=int, default=THREADS_POR_WORKER_PADRAO,
+                        help="Threads internas (Paddle/OpenCV) de cada processo.")
+    parser.add_argument("--fila_max", type=int, default=FILA_MAX_PADRAO,
+                        help="Imagens pendentes aceitas; acima disso a resposta é 429.")
+    args = parser.parse_args()
+
+    criarTabela()
+    POOL = PoolInferencia(args.processos, args.threads_por_worker, args.fila_max)
+    try:
+        app.run(host=args.host, port=args.porta, threaded=True)
+    finally:
+        POOL.encerrar()
+
+
+if __name__ == "__main__":
+    main()
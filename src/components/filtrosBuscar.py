@@ -4,6 +4,7 @@ from datetime import datetime
 def buscar():
     st.subheader("Filtros de Busca")
     filtro_placa = st.text_input("Buscar por placa")
+    aproximada = st.checkbox("Busca aproximada (tolera confusões do OCR: O/0, B/8, S/5...)", value=False)
 # aqui acontece a seleção de datas
     col1, col2 = st.columns(2)
     with col1:
@@ -26,6 +27,7 @@ def buscar():
 # retorna um dicionario com os filtros
     return {
         "placa": filtro_placa if filtro_placa else None,
+        "aproximada": aproximada,
         "data_inicio": data_inicio,
         "data_fim": data_final
     }
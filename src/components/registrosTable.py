@@ -6,10 +6,13 @@ def set_delete_id(record_id):
     """Define o ID do registro a ser excluído no session_state."""
     st.session_state.delete_id = record_id
 
-def registroTable(registros):
+def registroTable(registros, total=None, carregar_imagem=None):
     """
     Renderiza uma tabela simples de registros de placas no Streamlit,
     incluindo as ações de Visualizar e Excluir.
+    `total`: quantidade de registros da consulta inteira (o título mostra len(registros) se None).
+    `carregar_imagem`: função (id) -> data URI chamada só quando a linha é expandida,
+    para registros que não trazem "imagem" (consulta paginada).
     """
 
     if not registros:
@@ -17,7 +20,7 @@ def registroTable(registros):
 
     # ---- Título com contador de resultados ----
     st.markdown(
-        f"<h3>Consulta de Placas <span style='color:#69a6ff'>({len(registros)})</span></h3>",
+        f"<h3>Consulta de Placas <span style='color:#69a6ff'>({total if total is not None else len(registros)})</span></h3>",
         unsafe_allow_html=True
     )
 
@@ -82,8 +85,9 @@ def registroTable(registros):
         except Exception:
             data_fmt = data
 
-        # Cria estado expandido/fechado por linha (toggle)
-        st.session_state.setdefault(f"open_{i}", False)
+        # Cria estado expandido/fechado por linha (toggle); a chave usa o id para valer entre páginas
+        chave = registro_id if registro_id is not None else i
+        st.session_state.setdefault(f"open_{chave}", False)
 
         # Linha com 4 colunas alinhadas verticalmente ao centro.
         col1, col2, col3, col4 = st.columns([2.2, 1.5, 1.3, 1.4], vertical_alignment="center")
@@ -100,8 +104,8 @@ def registroTable(registros):
 
             with b_ver:
                 # Botão "Ver"
-                if st.button("Ver", key=f"toggle_{i}", width='stretch', help="Clique para visualizar o crop da placa."): 
-                    st.session_state[f"open_{i}"] = not st.session_state[f"open_{i}"]
+                if st.button("Ver", key=f"toggle_{chave}", width='stretch', help="Clique para visualizar o crop da placa."): 
+                    st.session_state[f"open_{chave}"] = not st.session_state[f"open_{chave}"]
             
             with b_del:
                 if registro_id is not None:
@@ -118,7 +122,10 @@ def registroTable(registros):
 
 
         # Área expandida: exibe imagem (crop da placa) e detalhes
-        if st.session_state[f"open_{i}"]:
+        if st.session_state[f"open_{chave}"]:
+            # Imagem buscada sob demanda (só para a linha aberta)
+            if img is None and carregar_imagem is not None and registro_id is not None:
+                img = carregar_imagem(registro_id)
             with st.expander(f"Visualizando imagem de {placa}", expanded=True):
                 
                 # Divide o expander em 2 colunas: 1 para imagem, 1 para detalhes
@@ -1,5 +1,6 @@
+import os
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -18,8 +19,47 @@ ANNOTATED_DIR = BASE_DIR / 'static' / 'annotated'
 for directory in [UPLOAD_DIR, CROP_DIR, ANNOTATED_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
+#perfil do sqlite: "producao" (padrao) aplica os pragmas abaixo em toda conexao nova;
+#"padrao" deixa o sqlite como vem (DB_PERFIL=padrao no ambiente)
+DB_PERFIL = os.environ.get("DB_PERFIL", "producao")
+
+#- journal_mode=WAL: leitores (pagina de consulta) nao bloqueiam o escritor (pipeline) e vice-versa
+#- synchronous=NORMAL: com WAL nao corrompe; so perde os ultimos commits se a MAQUINA cair
+#- cache_size negativo = KiB de cache de paginas por conexao; mmap_size em bytes
+#- busy_timeout: espera (ms) pelo lock de escrita em vez de falhar com "database is locked"
+PRAGMAS_PRODUCAO = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+#pool de conexoes (cada conexao ja sai configurada com os pragmas)
+POOL_TAMANHO = int(os.environ.get("DB_POOL_TAMANHO", "5"))
+POOL_EXTRA = int(os.environ.get("DB_POOL_EXTRA", "10"))
+
 #config padrao do alchemy
-engine = create_engine(DB_URL, echo=False, future=True)
+if DB_PERFIL == "producao":
+    engine = create_engine(
+        DB_URL, echo=False, future=True,
+        pool_size=POOL_TAMANHO, max_overflow=POOL_EXTRA,
+        #as conexoes do pool sao usadas por threads diferentes (ex.: EscritorPersistencia)
+        connect_args={"check_same_thread": False, "timeout": PRAGMAS_PRODUCAO["busy_timeout"] / 1000},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _aplicarPragmas(conexao_dbapi, _registro):
+        cursor = conexao_dbapi.cursor()
+        try:
+            for nome, valor in PRAGMAS_PRODUCAO.items():
+                cursor.execute(f"PRAGMA {nome}={valor}")
+        finally:
+            cursor.close()
+else:
+    engine = create_engine(DB_URL, echo=False, future=True)
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
@@ -27,4 +67,25 @@ Base = declarative_base()
 def criarTabela():
     #importe ta dentro da funcao para evitar erro circular
     from src.models.acessoModel import TabelaAcesso
+    from src.services.buscaPlaca import BuscaPlaca
     Base.metadata.create_all(bind=engine)
+    _adicionarColunasFaltantes()
+    #indice FTS5 (trigram) para busca de placa por trecho
+    BuscaPlaca.criarIndice(engine)
+
+#bancos criados por versoes antigas nao tem as colunas novas (create_all nao altera tabela existente)
+def _adicionarColunasFaltantes():
+    inspetor = inspect(engine)
+    with engine.begin() as conn:
+        for tabela in Base.metadata.sorted_tables:
+            if not inspetor.has_table(tabela.name):
+                continue
+            existentes = {c["name"] for c in inspetor.get_columns(tabela.name)}
+            for coluna in tabela.columns:
+                if coluna.name in existentes:
+                    continue
+                tipo = coluna.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}'))
+                print(f"[INFO] Coluna '{coluna.name}' adicionada à tabela '{tabela.name}'.")
+            for indice in tabela.indexes:
+                indice.create(bind=conn, checkfirst=True)
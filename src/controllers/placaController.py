@@ -1,7 +1,9 @@
 # src/controllers/placaController.py (Versão Final com Fallback)
 
 import cv2
+import time
 import base64
+import functools
 import numpy as np
 from typing import Any
 from pathlib import Path
@@ -9,22 +11,36 @@ from io import BytesIO, BufferedReader
 from datetime import datetime
 
 # Importação dos serviços
-from src.services.preprocessamento import Preprocessamento
 from src.services.binarizacao import Binarizacao
-from src.services.bordas import Bordas
-from src.services.contornos import Contornos
-from src.services.filtrarContornos import FiltrarContornos
+from src.services.deteccao import Deteccao
 from src.services.recorte import Recorte
 from src.services.segmentacao import Segmentacao
 from src.services.ocr import OCR
 from src.services.montagem import Montagem
 from src.services.validacao import Validacao
-from src.services.persistencia import Persistencia
+from src.services.persistencia import Persistencia, PERSISTENCIA_ASSINCRONA, TIMEOUT_ENFILEIRAR_PADRAO
 from src.services.analiseCor import AnaliseCor
+from src.services.armazenamentoImagens import ArmazenamentoImagens
+from src.services.buscaPlaca import BuscaPlaca
+from src.services.bordas import CANNY_PRESETS
+from src.services.detectorHaar import DetectorHaar
+from src.services.ocr import PoolOCR
+from src.services.cacheResultados import CacheResultados, CACHE_RESULTADOS, impressaoDigital
+from src.services.instrumentacao import Perfil, AGREGADOR_GLOBAL
+from src.services.ingestaoVideo import IngestaoVideo
+from src.services.rastreamento import RastreadorPlacas
+from src.services.qualidadeRecorte import QualidadeRecorte
 
 # Importação do modelo e da sessão do banco de dados
 from src.models.acessoModel import TabelaAcesso
 from src.config.db import SessionLocal
+from sqlalchemy import and_, or_
+
+# Parâmetros do fallback de candidatos
+NUM_CANDIDATOS_TENTAR = 5
+BLUE_THRESHOLD = 0.12 # Usando o valor otimizado
+# Mude ao alterar a lógica do pipeline: invalida as entradas antigas do CACHE_RESULTADOS
+VERSAO_PIPELINE = 1
 
 # --- (Funções auxiliares _overlay_contours, _overlay_quad, _read_image_bgr permanecem iguais) ---
 def _overlay_contours(bgr, contours, color=(0, 255, 255), thickness=2):
@@ -86,153 +102,444 @@ def _read_image_bgr(source: Any) -> np.ndarray:
 class PlacaController:
 
     @staticmethod
-    def processarImagem(source_image: Any, data_capturada: datetime, on_update=None):
+    def processarImagem(source_image: Any, data_capturada: datetime, on_update=None, escala_deteccao: float = 1.0,
+                        headless: bool = False):
+        """
+        Executa o pipeline completo sobre uma imagem.
+        `escala_deteccao`: fator de redução usado só na detecção (ex.: 0.5 para frames 1080p);
+        o recorte e o OCR continuam usando a imagem em resolução cheia.
+        `headless`: modo "produção" (servidor/lote): não monta o painel PDI — nada de overlays,
+        mapa de bordas combinado, cópias do frame ou binarização/segmentação extra do vencedor.
+        Nesse modo `on_update` é ignorado e o "panel" do retorno vem vazio.
+
+        O retorno traz também "perfil": tempos e contagens por etapa desta imagem
+        (ver src/services/instrumentacao.py), que também são somados ao AGREGADOR_GLOBAL.
+
+        Resultados ficam no CACHE_RESULTADOS (chave = pixels decodificados + configuração):
+        reenviar a mesma imagem devolve texto, quad e recorte guardados sem refazer detecção/OCR
+        ("cache" no retorno indica "memoria"/"disco" nesse caso). A leitura é registrada no banco
+        do mesmo jeito.
+        """
+        perfil = Perfil()
+        inicio = time.perf_counter()
+        # Etapa 1: Leitura e Preparação
+        with perfil.etapa("leitura"):
+            img_bgr = _read_image_bgr(source_image)
+        return PlacaController._concluir(img_bgr, data_capturada, on_update, escala_deteccao, headless,
+                                         perfil, inicio)
+
+    @staticmethod
+    def processarFrame(frame_bgr: np.ndarray, data_capturada: datetime, escala_deteccao: float = 1.0):
+        """
+        Igual a processarImagem(..., headless=True), mas para um frame BGR já decodificado
+        (ex.: vindo do cv2.VideoCapture). Um ndarray passado a processarImagem é tratado como RGB.
+        """
+        return PlacaController._concluir(frame_bgr, data_capturada, None, escala_deteccao, True,
+                                         Perfil(), time.perf_counter())
+
+    @staticmethod
+    def processarVideo(fonte: Any, on_resultado=None, escala_deteccao: float = 1.0, amostragem: int = 1,
+                       movimento: bool = True, fila_max: int = 4, parametros_rastreamento: dict = None,
+                       inicio: datetime = None, **parametros_movimento):
+        """
+        Lê um vídeo (arquivo, câmera V4L2 ou URL de stream) e reconhece as placas que passam.
+        Só os frames aprovados pelo filtro de movimento (src/services/ingestaoVideo.py) passam
+        pela detecção; os candidatos de frames consecutivos são associados em trilhas
+        (src/services/rastreamento.py). Cada trilha guarda os recortes mais bem avaliados
+        (QualidadeRecorte: nitidez + tamanho) de uma janela de frames e só eles vão para o OCR.
+        Quando a trilha sai de cena, as leituras válidas são votadas caractere a caractere e
+        UMA linha é gravada no banco por veículo.
+
+        `on_resultado(resultado)` é chamado para cada trilha consolidada, com "trilha", "texto_final",
+        "padrao", "primeiro_frame", "ultimo_frame", "leituras", "quad" e "crop".
+        `inicio`: data/hora em que um arquivo de vídeo começou a ser gravado; a data gravada no banco
+        é `inicio` + a posição do frame no vídeo (em fontes ao vivo vale o relógio da máquina).
+        Retorna as estatísticas da ingestão somadas às contagens de trilhas, placas e chamadas de OCR.
+        """
+        rastreador = RastreadorPlacas(**(parametros_rastreamento or {}))
+        contagem = {"trilhas": 0, "placas": 0, "chamadas_ocr": 0}
+
+        def _fechar(trilhas, perfil):
+            for trilha in trilhas:
+                PlacaController._lerJanela(trilha, trilha.fecharJanela(rastreador.config, final=True), rastreador.config,
+                                           perfil)
+                contagem["trilhas"] += 1
+                consolidado = trilha.consolidar()
+                if consolidado is None: continue
+                placa, padrao, leitura = consolidado
+                contagem["placas"] += 1
+                print(f"[INFO] Trilha #{trilha.id} (frames {trilha.primeiro_frame}-{trilha.ultimo_frame}): {placa}")
+                PlacaController._persistir(placa, leitura["frame"], leitura["crop"], leitura["quad"],
+                                           leitura["data"], perfil)
+                if on_resultado is not None:
+                    on_resultado({"trilha": trilha.id, "texto_final": placa, "padrao": padrao,
+                                  "primeiro_frame": trilha.primeiro_frame, "ultimo_frame": trilha.ultimo_frame,
+                                  "leituras": len(trilha.leituras), "quad": leitura["quad"], "crop": leitura["crop"]})
+
+        with IngestaoVideo(fonte, amostragem=amostragem, movimento=movimento, fila_max=fila_max, inicio=inicio,
+                           **parametros_movimento) as ingestao:
+            for indice, instante, frame_bgr in ingestao.frames():
+                perfil = PlacaController._rastrearFrame(rastreador, frame_bgr, indice, datetime.fromtimestamp(instante),
+                                                        escala_deteccao, _fechar)
+                contagem["chamadas_ocr"] += perfil["contadores"].get("chamadas_ocr", 0)
+            perfil = Perfil()
+            _fechar(rastreador.encerrarTodas(), perfil)
+            contagem["chamadas_ocr"] += perfil.contadores.get("chamadas_ocr", 0)
+            AGREGADOR_GLOBAL.registrar(perfil.exportar())
+        return {**ingestao.estatisticas, **contagem}
+
+    @staticmethod
+    def _rastrearFrame(rastreador, frame_bgr, indice, data_capturada, escala_deteccao, fechar):
+        """ Detecção + associação + seleção de recortes (e OCR das janelas cheias) de um frame. Retorna o perfil exportado. """
+        perfil = Perfil()
+        inicio = time.perf_counter()
+        deteccao = Deteccao.executar(frame_bgr, escala=escala_deteccao, perfil=perfil)
+        quads = [c.get("quad") for c in deteccao["candidatos"][:NUM_CANDIDATOS_TENTAR]]
+        with perfil.etapa("rastreamento"):
+            vistas, encerradas = rastreador.atualizar(quads, indice)
+
+        for trilha, quad in vistas:
+            if trilha.esgotada(rastreador.config): continue
+            try:
+                with perfil.etapa("recorte"):
+                    crop_bgr = Recorte.executar(frame_bgr, quad)
+                with perfil.etapa("qualidade"):
+                    qualidade = QualidadeRecorte.executar(crop_bgr, quad)
+                trilha.observar({"qualidade": qualidade, "crop": crop_bgr, "frame": frame_bgr, "quad": quad,
+                                 "data": data_capturada, "indice": indice}, rastreador.config)
+                PlacaController._lerJanela(trilha, trilha.fecharJanela(rastreador.config), rastreador.config, perfil)
+            except Exception as loop_error:
+                print(f"[WARN] Erro ao processar a trilha #{trilha.id} no frame {indice}: {loop_error}")
+
+        perfil.contar("trilhas_novas", sum(1 for trilha, _ in vistas if trilha.frames == 1))
+        fechar(encerradas, perfil)
+        perfil.registrarTempo("total", time.perf_counter() - inicio)
+        exportado = perfil.exportar()
+        AGREGADOR_GLOBAL.registrar(exportado)
+        return exportado
+
+    @staticmethod
+    def _lerJanela(trilha, recortes, config, perfil):
+        """ OCR dos recortes escolhidos de uma trilha, do melhor para o pior, até a primeira leitura válida. """
+        for recorte in recortes:
+            if trilha.esgotada(config): return
+            with perfil.etapa("ocr"):
+                texto_ocr, confiancas = OCR.executarImg(recorte["crop"])
+            perfil.contar("chamadas_ocr")
+            escolha = PlacaController._avaliarLeitura(recorte["crop"], texto_ocr, confiancas, perfil)
+            if not escolha:
+                trilha.registrarOcr(recorte)
+                continue
+            placa, padrao = escolha
+            peso = max(float(np.mean(confiancas)) if confiancas else 0.0, 1e-3)
+            trilha.registrarOcr(recorte, {**recorte, "placa": placa, "padrao": padrao, "peso": peso})
+            return
+
+    @staticmethod
+    def _concluir(img_bgr, data_capturada, on_update, escala_deteccao, headless, perfil, inicio):
+        resultado = PlacaController._executarPipeline(img_bgr, data_capturada, on_update,
+                                                      escala_deteccao, headless, perfil)
+        perfil.registrarTempo("total", time.perf_counter() - inicio)
+        resultado["perfil"] = perfil.exportar()
+        AGREGADOR_GLOBAL.registrar(resultado["perfil"])
+        return resultado
+
+    @staticmethod
+    def _executarPipeline(img_bgr, data_capturada, on_update, escala_deteccao, headless, perfil):
         panel = {}
         def _emit(delta: dict):
+            if headless: return
             panel.update(delta)
             if on_update is not None:
                 on_update(delta)
 
-        # Etapa 1: Leitura e Preparação
-        img_bgr = _read_image_bgr(source_image)
-        original = img_bgr.copy()
+        original = img_bgr if headless else img_bgr.copy() # o pipeline não altera img_bgr
         _emit({"original": original})
 
-        # Etapas 2 e 3: Pré-processamento, Detecção de Bordas e Contornos
-        preproc = Preprocessamento.executar(img_bgr)
-        _emit({"preproc": preproc})
-        canny_presets = [(50, 150), (100, 200), (150, 250)]
-        todos_os_contornos = []
-        mapa_de_bordas_visual = np.zeros_like(preproc)
-        for (t1, t2) in canny_presets:
-            edges = Bordas.executar(preproc, threshold1=t1, threshold2=t2)
-            mapa_de_bordas_visual = cv2.bitwise_or(mapa_de_bordas_visual, edges)
-            contours = Contornos.executar(edges)
-            todos_os_contornos.extend(contours)
-        _emit({"contours_overlay": _overlay_contours(original, todos_os_contornos), "bordas": mapa_de_bordas_visual})
-
-        # Etapa 4: Filtrar e Ranqueia Candidatos
-        candidatos = FiltrarContornos.executar(todos_os_contornos, img_bgr)
+        # Resultado já calculado para esta mesma imagem/configuração?
+        chave_cache = None
+        if CACHE_RESULTADOS.ativo:
+            with perfil.etapa("cache"):
+                chave_cache = CacheResultados.chave(img_bgr, PlacaController._impressaoConfig(escala_deteccao))
+                entrada, origem = CACHE_RESULTADOS.obter(chave_cache)
+            if entrada is not None:
+                perfil.contar(f"cache_acertos_{origem}")
+                return PlacaController._resultadoDoCache(entrada, origem, original, data_capturada, headless, _emit,
+                                                         panel, perfil)
+            perfil.contar("cache_falhas")
+
+        def _finalizar(status, texto_final=None, padrao=None, quad=None, quad_anotacao=None, crop=None):
+            entrada = {"status": status, "texto_final": texto_final, "padrao": padrao,
+                       "quad": quad, "quad_anotacao": quad_anotacao, "crop": crop}
+            if chave_cache is not None: CACHE_RESULTADOS.guardar(chave_cache, entrada)
+            return {**entrada, "panel": panel, "cache": None}
+
+        # Etapas 2, 3 e 4: Pré-processamento, Bordas, Contornos, Haar e ranking dos candidatos
+        deteccao = Deteccao.executar(img_bgr, escala=escala_deteccao, perfil=perfil)
+        if not headless:
+            with perfil.etapa("painel"):
+                preproc, todos_os_contornos = deteccao["preproc"], deteccao["contornos"]
+                _emit({"preproc": preproc})
+                mapa_de_bordas_visual = np.zeros_like(preproc)
+                for edges in deteccao["bordas"]:
+                    mapa_de_bordas_visual = cv2.bitwise_or(mapa_de_bordas_visual, edges)
+                _emit({"contours_overlay": _overlay_contours(original, todos_os_contornos), "bordas": mapa_de_bordas_visual})
+
+        candidatos = deteccao["candidatos"]
         if not candidatos:
-            return { "status": "erro", "texto_final": None, "panel": panel }
+            perfil.contar("sem_candidatos")
+            return _finalizar("erro")
 
         # Guarda o overlay do melhor candidato inicial para o painel
         best_initial = candidatos[0]
-        plate_bbox_overlay = _overlay_quad(original, best_initial.get("quad"))
-        _emit({"plate_bbox_overlay": plate_bbox_overlay})
+        if not headless:
+            with perfil.etapa("painel"):
+                _emit({"plate_bbox_overlay": _overlay_quad(original, best_initial.get("quad"))})
 
         # --- NOVA LÓGICA DE FALLBACK INTELIGENTE ---
         texto_final = None
         crop_final_bgr = None # Guarda o crop da placa encontrada
-        NUM_CANDIDATOS_TENTAR = 5
-        blue_threshold = 0.12 # Usando o valor otimizado
 
+        # 5. Recorte de todos os candidatos do fallback (na ordem do ranking)
+        tentativas = []
         for i, candidate in enumerate(candidatos[:NUM_CANDIDATOS_TENTAR]):
             candidate_quad = candidate.get("quad")
             if candidate_quad is None: continue
-
-            print(f"[DEBUG] Tentando candidato #{i+1}...") # Log para debug
-
             try:
-                # 5. Recorte (para o candidato atual)
-                crop_bgr = Recorte.executar(img_bgr, candidate_quad)
-
-                # 6. OCR (com crop colorido)
-                texto_ocr, confiancas = OCR.executarImg(crop_bgr)
-
-                # 7. Montagem e Validação
-                montagem_final = Montagem.executar(texto_ocr)
-                placas_validas = Validacao.executar(montagem_final, confiancas)
-
-                if placas_validas: # Encontrou uma leitura válida!
-                    # 8. Desambiguação por Cor (usando o crop atual)
-                    analise_cores = AnaliseCor.executar(crop_bgr)
-                    texto_placa_escolhida = None
-                    padrao_placa_escolhida = "INDEFINIDO"
-
-                    if len(placas_validas) == 1:
-                        texto_placa_escolhida, padrao_placa_escolhida = placas_validas[0]
-                    else:
-                        percent_azul_superior = analise_cores.get("percent_azul_superior", 0)
-                        if percent_azul_superior > blue_threshold:
-                            for placa, padrao in placas_validas:
-                                if padrao == "MERCOSUL": texto_placa_escolhida, padrao_placa_escolhida = placa, padrao; break
-                        else:
-                            for placa, padrao in placas_validas:
-                                if padrao == "ANTIGA": texto_placa_escolhida, padrao_placa_escolhida = placa, padrao; break
-                        if not texto_placa_escolhida: # Fallback
-                             texto_placa_escolhida, padrao_placa_escolhida = placas_validas[0]
-
-                    # Se encontrou um texto final válido, guarda e para o loop
-                    if texto_placa_escolhida:
-                        texto_final = texto_placa_escolhida
-                        padrao_placa = padrao_placa_escolhida
-                        crop_final_bgr = crop_bgr # Guarda o crop que deu certo
-                        print(f"[INFO] Placa encontrada no candidato #{i+1}: {texto_final}")
-
-                        # Atualiza o painel PDI com os dados do candidato vencedor
-                        _emit({"plate_crop": cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2RGB)})
-                        _emit({"ocr_text": texto_ocr})
-                        bin_img_pdi = Binarizacao.executar(crop_bgr)
-                        chars_pdi = Segmentacao.executar(bin_img_pdi)
-                        _emit({"binarizacao_vencedor": bin_img_pdi, "chars": chars_pdi}) # Usando chave antiga para compatibilidade
-                        _emit({"validation": { "válida": True, "saída": texto_final, "padrão": padrao_placa }})
-
-                        break # Sai do loop for i, candidate...
-
+                with perfil.etapa("recorte"):
+                    tentativas.append((i, Recorte.executar(img_bgr, candidate_quad)))
+            except Exception as loop_error:
+                print(f"[WARN] Erro ao recortar candidato #{i+1}: {loop_error}")
+
+        # 6. OCR em lote: todos os recortes passam pelo reconhecedor numa única inferência. O lote só
+        #    adianta as leituras rec-only; a ordem do ranking continua mandando: cada candidato tenta a
+        #    leitura do lote e, se ela não validar, o OCR completo (detecção + reconhecimento) antes de
+        #    passar ao próximo (um candidato pior não vence só por ter sido lido mais cedo).
+        with perfil.etapa("ocr_lote"):
+            leituras = OCR.executarLote([crop for _, crop in tentativas])
+        if tentativas: perfil.contar("chamadas_ocr")
+        vencedor = None
+        for (i, crop_bgr), (texto_ocr, confiancas) in zip(tentativas, leituras):
+            try:
+                escolha = PlacaController._avaliarLeitura(crop_bgr, texto_ocr, confiancas, perfil)
+                if escolha: vencedor = (i, crop_bgr, texto_ocr, escolha, "lote"); break
+                with perfil.etapa("ocr_completo"):
+                    texto_ocr, confiancas = OCR.executarImg(crop_bgr, modo="completo")
+                perfil.contar("chamadas_ocr")
+                escolha = PlacaController._avaliarLeitura(crop_bgr, texto_ocr, confiancas, perfil)
+                if escolha: vencedor = (i, crop_bgr, texto_ocr, escolha, "completo"); break
             except Exception as loop_error:
                 print(f"[WARN] Erro ao processar candidato #{i+1}: {loop_error}")
-                continue # Tenta o próximo candidato
+
+        if vencedor is not None:
+            i, crop_bgr, texto_ocr, (texto_final, padrao_placa), modo_ocr = vencedor
+            crop_final_bgr = crop_bgr # Guarda o crop que deu certo
+            perfil.contar(f"vencedor_rank_{i+1}")
+            perfil.contar(f"vencedor_ocr_{modo_ocr}")
+            if not headless: # em produção o rank vencedor vai para as métricas, sem I/O por imagem
+                print(f"[INFO] Placa encontrada no candidato #{i+1}: {texto_final}")
+
+            # Atualiza o painel PDI com os dados do candidato vencedor
+            if not headless:
+                with perfil.etapa("painel"):
+                    _emit({"plate_crop": cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2RGB)})
+                    _emit({"ocr_text": texto_ocr})
+                    bin_img_pdi = Binarizacao.executar(crop_bgr)
+                    chars_pdi = Segmentacao.executar(bin_img_pdi)
+                    _emit({"binarizacao_vencedor": bin_img_pdi, "chars": chars_pdi}) # Usando chave antiga para compatibilidade
+                    _emit({"validation": { "válida": True, "saída": texto_final, "padrão": padrao_placa }})
 
         # --- FIM DA LÓGICA DE FALLBACK ---
 
         # Se o loop terminou e texto_final AINDA é None, significa que nenhum candidato funcionou
         if texto_final is None:
-            print("[INFO] Nenhum candidato produziu uma placa válida após fallback.")
+            perfil.contar("sem_placa_valida")
+            if not headless:
+                print("[INFO] Nenhum candidato produziu uma placa válida após fallback.")
             # Atualiza o painel com o status de falha (pode usar dados do 1o candidato se quiser)
             _emit({"validation": { "válida": False, "saída": "", "padrão": "INDEFINIDO" }})
-            return { "status": "invalido", "texto_final": None, "panel": panel }
+            return _finalizar("invalido")
 
         # --- PERSISTÊNCIA (Somente se encontrou uma placa válida) ---
         if texto_final and crop_final_bgr is not None:
-            img_annot = _overlay_quad(original, best_initial.get("quad")) # Anota o 1o candidato detectado
-            if img_annot is None: img_annot = original # Fallback se overlay falhar
-            
-            # Converte o crop que deu certo para RGB antes de salvar
-            crop_rgb_para_salvar = cv2.cvtColor(crop_final_bgr, cv2.COLOR_BGR2RGB)
-            Persistencia.salvar(texto_final, 1.0, original, crop_rgb_para_salvar, img_annot, data_capturada)
+            PlacaController._persistir(texto_final, original, crop_final_bgr, best_initial.get("quad"),
+                                       data_capturada, perfil)
 
-        return { "status": "ok", "texto_final": texto_final, "panel": panel }
+        return _finalizar("ok", texto_final, padrao_placa, candidatos[vencedor[0]].get("quad"),
+                          best_initial.get("quad"), crop_final_bgr)
 
+    @staticmethod
+    def _avaliarLeitura(crop_bgr, texto_ocr, confiancas, perfil):
+        """ Montagem + Validação + Cor de uma leitura. Retorna (placa, padrao) ou None. """
+        # 7. Montagem e Validação
+        with perfil.etapa("validacao"):
+            montagem_final = Montagem.executar(texto_ocr)
+            placas_validas = Validacao.executar(montagem_final, confiancas)
+        if not placas_validas:
+            perfil.contar("validacao_rejeicoes")
+            return None
+        # 8. Desambiguação por Cor (usando o crop atual)
+        with perfil.etapa("cor"):
+            analise_cores = AnaliseCor.executar(crop_bgr)
+        placa, padrao = Validacao.desambiguarPorCor(
+            placas_validas, analise_cores.get("percent_azul_superior", 0), BLUE_THRESHOLD)
+        return (placa, padrao) if placa else None
 
-    # --- (Método consultarRegistros permanece o mesmo) ---
     @staticmethod
-    def consultarRegistros(arg=None, data_inicio: datetime = None, data_fim: datetime = None):
-        """ Consulta registros de placas no banco com filtros opcionais. """
-        placa = None
+    def _persistir(texto_final, original, crop_final_bgr, quad_anotacao, data_capturada, perfil):
+        img_annot = _overlay_quad(original, quad_anotacao) # Anota o 1o candidato detectado
+        if img_annot is None: img_annot = original # Fallback se overlay falhar
+
+        # Converte o crop que deu certo para RGB antes de salvar
+        crop_rgb_para_salvar = cv2.cvtColor(crop_final_bgr, cv2.COLOR_BGR2RGB)
+        with perfil.etapa("persistencia"):
+            # Por padrão só enfileira: a codificação JPEG e o commit ficam com o EscritorPersistencia
+            if PERSISTENCIA_ASSINCRONA:
+                Persistencia.salvarAssincrono(texto_final, 1.0, original, crop_rgb_para_salvar, img_annot, data_capturada,
+                                              timeout=TIMEOUT_ENFILEIRAR_PADRAO)
+            else:
+                Persistencia.salvar(texto_final, 1.0, original, crop_rgb_para_salvar, img_annot, data_capturada)
+
+    @staticmethod
+    def _impressaoConfig(escala_deteccao):
+        """ Tudo que muda o resultado do pipeline para uma mesma imagem (chave do CACHE_RESULTADOS). """
+        return impressaoDigital(
+            versao=VERSAO_PIPELINE, escala=escala_deteccao, candidatos=NUM_CANDIDATOS_TENTAR,
+            blue_threshold=BLUE_THRESHOLD, canny=tuple(CANNY_PRESETS),
+            haar=tuple(sorted(DetectorHaar._config.items())), ocr=tuple(sorted(PoolOCR._parametros.items())))
+
+    @staticmethod
+    def _resultadoDoCache(entrada, origem, original, data_capturada, headless, emit, panel, perfil):
+        """ Monta o retorno de processarImagem a partir de uma entrada do cache (sem detecção/OCR). """
+        crop = entrada.get("crop")
+        if not headless:
+            with perfil.etapa("painel"):
+                if entrada["status"] == "ok":
+                    emit({"plate_bbox_overlay": _overlay_quad(original, entrada.get("quad_anotacao"))})
+                    if crop is not None: emit({"plate_crop": cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)})
+                    emit({"validation": { "válida": True, "saída": entrada["texto_final"], "padrão": entrada["padrao"] }})
+                elif entrada["status"] == "invalido":
+                    emit({"validation": { "válida": False, "saída": "", "padrão": "INDEFINIDO" }})
+        if entrada["status"] == "ok" and crop is not None:
+            PlacaController._persistir(entrada["texto_final"], original, crop, entrada.get("quad_anotacao"),
+                                       data_capturada, perfil)
+        return {**entrada, "panel": panel, "cache": origem}
+
+
+    @staticmethod
+    def _filtros(arg=None, data_inicio: datetime = None, data_fim: datetime = None):
+        """ Normaliza os filtros (dict da UI ou texto da placa) para (placa, data_inicio, data_fim, aproximada). """
+        placa, aproximada = None, False
         if isinstance(arg, dict):
             placa = arg.get("placa")
+            aproximada = bool(arg.get("aproximada", False))
             data_inicio = arg.get("data_inicio", data_inicio)
             data_fim = arg.get("data_fim", data_fim)
         else:
             placa = arg
+        return placa, data_inicio, data_fim, aproximada
+
+    @staticmethod
+    def _aplicarFiltros(db, query, placa, data_inicio, data_fim, aproximada=False):
+        if placa:
+            # Busca por trecho no índice FTS5/trigram (ver BuscaPlaca); aproximada tolera O/0, B/8...
+            query = query.filter(BuscaPlaca.filtro(db, TabelaAcesso.id, TabelaAcesso.plate_text, placa, aproximada))
+        if data_inicio:
+            query = query.filter(TabelaAcesso.created_at >= data_inicio)
+        if data_fim:
+            query = query.filter(TabelaAcesso.created_at <= data_fim)
+        return query
+
+    @staticmethod
+    def _imagemDataUri(dados):
+        if not dados: return None
+        return "data:image/jpeg;base64," + base64.b64encode(dados).decode("utf-8")
+
+    @staticmethod
+    def consultarPagina(arg=None, data_inicio: datetime = None, data_fim: datetime = None,
+                        limite: int = 20, cursor=None, contar_total: bool = True):
+        """
+        Consulta paginada (keyset em created_at, id — do mais recente para o mais antigo).
+        Lê só as colunas da listagem (nada de imagens); a imagem de cada linha é buscada
+        sob demanda com obterImagem(id).
+
+        `cursor`: None para a primeira página ou o "proximo_cursor" da página anterior.
+        Retorna {"registros": [{"id", "placa", "data"}], "proximo_cursor": cursor ou None,
+                 "total": quantidade de registros que casam com os filtros (ou None)}.
+        """
+        placa, data_inicio, data_fim, aproximada = PlacaController._filtros(arg, data_inicio, data_fim)
+        limite = max(1, int(limite))
+        db = SessionLocal()
+        try:
+            query = db.query(TabelaAcesso.id, TabelaAcesso.plate_text, TabelaAcesso.created_at)
+            query = PlacaController._aplicarFiltros(db, query, placa, data_inicio, data_fim, aproximada)
+            total = query.count() if contar_total else None
+            if cursor is not None:
+                cursor_data, cursor_id = cursor
+                query = query.filter(or_(TabelaAcesso.created_at < cursor_data,
+                                         and_(TabelaAcesso.created_at == cursor_data, TabelaAcesso.id < cursor_id)))
+            # Um registro a mais só para saber se existe próxima página
+            linhas = query.order_by(TabelaAcesso.created_at.desc(), TabelaAcesso.id.desc()).limit(limite + 1).all()
+
+            proximo_cursor = None
+            if len(linhas) > limite:
+                linhas = linhas[:limite]
+                proximo_cursor = (linhas[-1].created_at, linhas[-1].id)
+            registros = [{
+                "id": r.id,
+                "placa": r.plate_text,
+                "data": r.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            } for r in linhas]
+            return {"registros": registros, "proximo_cursor": proximo_cursor, "total": total}
+        except Exception as e:
+            print(f"[ERRO] Erro ao consultar registros: {e}")
+            return {"registros": [], "proximo_cursor": None, "total": 0}
+        finally:
+            db.close()
 
+    @staticmethod
+    def obterImagem(registro_id: Any, tipo: str = "crop"):
+        """ Retorna a imagem ("source", "crop" ou "annotated") de um registro como data URI, ou None. """
+        colunas = {
+            "source": (TabelaAcesso.source_hash, TabelaAcesso.source_image),
+            "crop": (TabelaAcesso.crop_hash, TabelaAcesso.plate_crop_image),
+            "annotated": (TabelaAcesso.annotated_hash, TabelaAcesso.annotated_image),
+        }
+        coluna_hash, coluna_legado = colunas[tipo]
         db = SessionLocal()
         try:
-            query = db.query(TabelaAcesso)
-            if placa:
-                query = query.filter(TabelaAcesso.plate_text.ilike(f"%{placa}%"))
-            if data_inicio:
-                query = query.filter(TabelaAcesso.created_at >= data_inicio)
-            if data_fim:
-                query = query.filter(TabelaAcesso.created_at <= data_fim)
-
-            registros = query.order_by(TabelaAcesso.created_at.desc()).all()
+            linha = db.query(coluna_hash).filter(TabelaAcesso.id == registro_id).first()
+            if linha is None:
+                return None
+            dados = ArmazenamentoImagens.ler(tipo, linha[0])
+            if dados is None:
+                # Banco ainda não migrado: imagem no BLOB legado
+                dados = db.query(coluna_legado).filter(TabelaAcesso.id == registro_id).scalar()
+            return PlacaController._imagemDataUri(dados)
+        except Exception as e:
+            print(f"[ERRO] Erro ao buscar imagem do registro {registro_id}: {e}")
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def consultarRegistros(arg=None, data_inicio: datetime = None, data_fim: datetime = None):
+        """
+        Consulta TODOS os registros de placas com filtros opcionais, já com o recorte em data URI.
+        Para listagens use consultarPagina() + obterImagem(), que não carregam imagens à toa.
+        """
+        placa, data_inicio, data_fim, aproximada = PlacaController._filtros(arg, data_inicio, data_fim)
+        db = SessionLocal()
+        try:
+            query = db.query(TabelaAcesso.id, TabelaAcesso.plate_text, TabelaAcesso.created_at, TabelaAcesso.crop_hash)
+            query = PlacaController._aplicarFiltros(db, query, placa, data_inicio, data_fim, aproximada)
+            registros = query.order_by(TabelaAcesso.created_at.desc(), TabelaAcesso.id.desc()).all()
             out = []
             for r in registros:
-                img_b64 = None
-                if r.plate_crop_image:
-                    img_b64 = "data:image/png;base64," + base64.b64encode(r.plate_crop_image).decode("utf-8")
+                # Recorte vem do armazenamento em disco; bancos não migrados ainda têm o BLOB legado
+                crop_bytes = ArmazenamentoImagens.ler("crop", r.crop_hash)
+                img_b64 = (PlacaController._imagemDataUri(crop_bytes) if crop_bytes
+                           else PlacaController.obterImagem(r.id, "crop"))
                 out.append({
                     "id": r.id,
                     "placa": r.plate_text,
@@ -246,6 +553,17 @@ class PlacaController:
         finally:
             db.close()
 
+    @staticmethod
+    def _imagemReferenciada(tipo: str, hash_imagem: str) -> bool:
+        """ Se algum registro usa a imagem; sessão nova a cada chamada, para ver os commits mais recentes. """
+        colunas = {"source": TabelaAcesso.source_hash, "crop": TabelaAcesso.crop_hash,
+                   "annotated": TabelaAcesso.annotated_hash}
+        db = SessionLocal()
+        try:
+            return db.query(TabelaAcesso.id).filter(colunas[tipo] == hash_imagem).first() is not None
+        finally:
+            db.close()
+
     @staticmethod
     def excluirRegistro(registro_id: Any) -> bool:
         db = SessionLocal()
@@ -257,8 +575,16 @@ class PlacaController:
             registro = db.query(TabelaAcesso).filter(TabelaAcesso.id == registro_id).first()
 
             if registro:
+                hashes = {"source": registro.source_hash, "crop": registro.crop_hash,
+                          "annotated": registro.annotated_hash}
                 db.delete(registro)
                 db.commit()
+                # Só depois do commit: se ele falhar o registro continua no banco com os arquivos.
+                # Apaga do disco as imagens que nenhum outro registro referencia; um registro novo
+                # com o mesmo hash que commitar no meio regrava o arquivo (Persistencia._confirmarArquivos).
+                for tipo, hash_imagem in hashes.items():
+                    ArmazenamentoImagens.removerSemReferencia(
+                        tipo, hash_imagem, functools.partial(PlacaController._imagemReferenciada, tipo, hash_imagem))
                 # ... (prints e return True)
                 return True
             # ... (else e return False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, LargeBinary
+from sqlalchemy import Column, Integer, String, Float, DateTime, LargeBinary, Index
 from datetime import datetime
 from src.config.db import Base
 
@@ -25,17 +25,30 @@ class TabelaAcesso(Base):
     # pelo pipeline). No MVP usamos valor fixo 1.0 no salvamento.
     confidence = Column(Float, default=0.0)
 
-    # Imagens armazenadas como binário (BLOB):
-    # - source_image: frame/imagem original de onde a placa foi lida.
-    # - plate_crop_image: recorte da região da placa (útil para visualização).
-    # - annotated_image: imagem com bounding box/quadrilátero desenhado.
-    # Observação: optar por BLOB simplifica distribuição (sem gerenciar paths),
-    # mas aumenta o tamanho do banco. Em produção, pode-se trocar por armazenamento
-    # em disco/objeto (S3 etc.) e salvar apenas paths/URLs.
-    source_image = Column(LargeBinary)
-    plate_crop_image = Column(LargeBinary)
-    annotated_image = Column(LargeBinary)
+    # Imagens: ficam em disco no ArmazenamentoImagens (src/services/armazenamentoImagens.py),
+    # endereçadas pelo sha256 do conteúdo; aqui guardamos só o hash de cada uma:
+    # - source_hash: frame/imagem original de onde a placa foi lida.
+    # - crop_hash: recorte da região da placa (útil para visualização).
+    # - annotated_hash: imagem com bounding box/quadrilátero desenhado.
+    # Indexados para saber, ao excluir um registro, se o arquivo ainda é usado por outro.
+    source_hash = Column(String(64), index=True, nullable=True)
+    crop_hash = Column(String(64), index=True, nullable=True)
+    annotated_hash = Column(String(64), index=True, nullable=True)
+
+    # LEGADO: bancos antigos guardavam as imagens como BLOB nestas colunas.
+    # Registros novos não as preenchem; `python migrar_imagens.py` move o conteúdo
+    # existente para o armazenamento em disco e as esvazia.
+    source_image = Column(LargeBinary, nullable=True)
+    plate_crop_image = Column(LargeBinary, nullable=True)
+    annotated_image = Column(LargeBinary, nullable=True)
 
     # Momento em que o registro foi criado. Usamos UTC por padrão para
     # evitar ambiguidade de fuso horário; a UI pode converter para o fuso local.
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Índice composto para as consultas por período (+ placa): atende o filtro de data,
+    # o ORDER BY created_at DESC, id DESC da paginação (id explícito logo após created_at,
+    # senão o SQLite ordena os empates numa B-tree temporária) e devolve plate_text sem ir à tabela.
+    __table_args__ = (
+        Index("ix_acessos_created_at_id_plate_text", "created_at", "id", "plate_text"),
+    )
@@ -28,6 +28,10 @@ def handle_delete(registro_id):
         st.error(f"Erro inesperado ao excluir o registro '{registro_id}': {e}")
 
 
+# Quantos registros por página na tabela
+REGISTROS_POR_PAGINA = 20
+
+
 class consultarRegistroPage:
     def app():
         # --- Configuração Inicial de Session State ---
@@ -35,9 +39,19 @@ class consultarRegistroPage:
         if 'refresh_data' not in st.session_state:
             st.session_state.refresh_data = True
         
-        # Usado para armazenar a lista de registros para não recarregar em cada interação.
+        # Usado para armazenar a página atual de registros para não recarregar em cada interação.
         if 'registros_data' not in st.session_state:
             st.session_state.registros_data = []
+        # Paginação por cursor: pilha com o cursor de início de cada página visitada
+        # (o topo é a página atual) e o cursor da próxima página.
+        if 'registros_cursores' not in st.session_state:
+            st.session_state.registros_cursores = [None]
+        if 'registros_proximo' not in st.session_state:
+            st.session_state.registros_proximo = None
+        if 'registros_total' not in st.session_state:
+            st.session_state.registros_total = 0
+        if 'registros_filtros' not in st.session_state:
+            st.session_state.registros_filtros = None
 
         st.title("Consultar Registros")
 
@@ -46,6 +60,11 @@ class consultarRegistroPage:
         # ------------------------------------------------------------------
         # A função buscar() deve retornar um dicionário com os filtros.
         filtros = buscar()
+        # Filtros mudaram: volta para a primeira página
+        if filtros != st.session_state.registros_filtros:
+            st.session_state.registros_filtros = filtros
+            st.session_state.registros_cursores = [None]
+            st.session_state.refresh_data = True
 
         # ------------------------------------------------------------------
         # 2) Lógica de Exclusão
@@ -58,25 +77,63 @@ class consultarRegistroPage:
             st.session_state.delete_id = None # Limpa após o uso
 
         # ------------------------------------------------------------------
-        # 3) Consulta no banco
-        # Só executa se for o primeiro carregamento ou se houver um refresh (após exclusão).
+        # 3) Consulta no banco (só a página atual, sem imagens)
+        # Só executa se for o primeiro carregamento, se os filtros/página mudarem ou após exclusão.
         # ------------------------------------------------------------------
         if st.session_state.refresh_data:
             with st.spinner('Consultando registros...'):
-                registros = PlacaController.consultarRegistros(
+                pagina = PlacaController.consultarPagina(
                     arg=filtros,
                     data_inicio=filtros.get("data_inicio"),
                     data_fim=filtros.get("data_fim"),
+                    limite=REGISTROS_POR_PAGINA,
+                    cursor=st.session_state.registros_cursores[-1],
                 )
             
             # Atualiza o estado da sessão com os novos dados e reseta o flag de refresh
-            st.session_state.registros_data = registros
+            st.session_state.registros_data = pagina["registros"]
+            st.session_state.registros_proximo = pagina["proximo_cursor"]
+            st.session_state.registros_total = pagina["total"]
             st.session_state.refresh_data = False
+
+            # Página ficou vazia (ex.: excluiu o último registro dela): volta uma página
+            if not pagina["registros"] and len(st.session_state.registros_cursores) > 1:
+                st.session_state.registros_cursores.pop()
+                st.session_state.refresh_data = True
+                st.rerun()
         
         # ------------------------------------------------------------------
-        # 4) Renderização da tabela
+        # 4) Renderização da tabela (imagens carregadas só ao clicar em "Ver")
         # ------------------------------------------------------------------
         if st.session_state.registros_data:
-            registroTable(st.session_state.registros_data)
+            registroTable(st.session_state.registros_data,
+                          total=st.session_state.registros_total,
+                          carregar_imagem=PlacaController.obterImagem)
+            _paginacao()
         elif not st.session_state.refresh_data:
-             st.info("Nenhum registro encontrado com os filtros aplicados.")
\ No newline at end of file
+             st.info("Nenhum registro encontrado com os filtros aplicados.")
+
+
+def _ir_para_proxima():
+    st.session_state.registros_cursores.append(st.session_state.registros_proximo)
+    st.session_state.refresh_data = True
+
+def _ir_para_anterior():
+    st.session_state.registros_cursores.pop()
+    st.session_state.refresh_data = True
+
+def _paginacao():
+    """ Botões Anterior/Próxima e indicação da página atual. """
+    num_pagina = len(st.session_state.registros_cursores)
+    total = st.session_state.registros_total or 0
+    num_paginas = max(1, -(-total // REGISTROS_POR_PAGINA))
+    c_ant, c_info, c_prox = st.columns([1, 2, 1], vertical_alignment="center")
+    with c_ant:
+        st.button("← Anterior", key="pagina_anterior", on_click=_ir_para_anterior,
+                  disabled=num_pagina <= 1, width='stretch')
+    with c_info:
+        st.markdown(f"<div style='text-align:center'>Página {num_pagina} de {num_paginas}</div>",
+                    unsafe_allow_html=True)
+    with c_prox:
+        st.button("Próxima →", key="pagina_proxima", on_click=_ir_para_proxima,
+                  disabled=st.session_state.registros_proximo is None, width='stretch')
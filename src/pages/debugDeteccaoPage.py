@@ -7,7 +7,7 @@ from src.controllers.placaController import _read_image_bgr, _overlay_contours
 
 # Importa os serviços
 from src.services.preprocessamento import Preprocessamento
-from src.services.bordas import Bordas
+from src.services.bordas import Bordas, CANNY_PRESETS
 from src.services.contornos import Contornos
 from src.services.filtrarContornos import FiltrarContornos
 from src.services.segmentacao import Segmentacao 
@@ -32,10 +32,8 @@ def app():
     preproc_img = Preprocessamento.executar(img_bgr)
     
     # Lógica de detecção
-    canny_presets = [(50, 150), (100, 200), (150, 250)]
     todos_os_contornos = []
-    for (t1, t2) in set(canny_presets):
-        edges = Bordas.executar(preproc_img, threshold1=t1, threshold2=t2)
+    for edges in Bordas.executarMulti(preproc_img, CANNY_PRESETS):
         todos_os_contornos.extend(Contornos.executar(edges))
         
     st.subheader("Visualização dos Candidatos")
@@ -0,0 +1,85 @@
+# src/services/armazenamentoImagens.py
+
+import os
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+from src.config.db import UPLOAD_DIR, CROP_DIR, ANNOTATED_DIR
+
+# Tipo de imagem -> diretório onde os arquivos ficam
+DIRETORIOS = {
+    "source": UPLOAD_DIR,
+    "crop": CROP_DIR,
+    "annotated": ANNOTATED_DIR,
+}
+EXTENSAO = ".jpg"
+
+
+class ArmazenamentoImagens:
+    """
+    Armazenamento endereçado por conteúdo: cada imagem é gravada como
+    <diretório do tipo>/<sha256 dos bytes>.jpg e o banco guarda só o hash.
+    Bytes iguais geram o mesmo hash, então uploads repetidos ocupam um único arquivo.
+    """
+
+    @staticmethod
+    def calcularHash(dados: bytes) -> str:
+        return hashlib.sha256(dados).hexdigest()
+
+    @staticmethod
+    def caminho(tipo: str, hash_imagem: str) -> Path:
+        return DIRETORIOS[tipo] / f"{hash_imagem}{EXTENSAO}"
+
+    @staticmethod
+    def salvar(tipo: str, dados: bytes) -> str:
+        """ Grava os bytes (se ainda não existirem) e retorna o hash. """
+        hash_imagem = ArmazenamentoImagens.calcularHash(dados)
+        destino = ArmazenamentoImagens.caminho(tipo, hash_imagem)
+        if destino.exists():
+            return hash_imagem  # mesmo conteúdo já armazenado
+        # Escreve num temporário e renomeia: um leitor nunca vê um arquivo pela metade
+        fd, temporario = tempfile.mkstemp(dir=destino.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dados)
+            os.replace(temporario, destino)
+        except Exception:
+            if os.path.exists(temporario): os.remove(temporario)
+            raise
+        return hash_imagem
+
+    @staticmethod
+    def ler(tipo: str, hash_imagem: str):
+        """ Retorna os bytes da imagem ou None se o hash for vazio/arquivo não existir. """
+        if not hash_imagem:
+            return None
+        try:
+            return ArmazenamentoImagens.caminho(tipo, hash_imagem).read_bytes()
+        except FileNotFoundError:
+            print(f"[WARN] Imagem '{hash_imagem}' ({tipo}) não encontrada no armazenamento.")
+            return None
+
+    @staticmethod
+    def removerSemReferencia(tipo: str, hash_imagem: str, referenciado) -> bool:
+        """
+        Apaga o arquivo se `referenciado()` (consulta nova ao banco a cada chamada) disser que
+        nenhum registro o usa. O arquivo é primeiro renomeado e a contagem refeita: se nesse meio
+        tempo um registro com o mesmo hash foi commitado, o arquivo volta ao lugar.
+        Retorna True se o arquivo foi apagado.
+        """
+        if not hash_imagem or referenciado():
+            return False
+        origem = ArmazenamentoImagens.caminho(tipo, hash_imagem)
+        descartado = origem.with_name(f"{hash_imagem}.{os.getpid()}.{threading.get_ident()}.removendo")
+        try:
+            os.replace(origem, descartado)
+        except FileNotFoundError:
+            return False
+        if referenciado():
+            # Mesmos bytes que um salvar() concorrente gravaria: devolver é sempre seguro
+            os.replace(descartado, origem)
+            return False
+        os.remove(descartado)
+        return True
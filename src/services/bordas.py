@@ -1,6 +1,10 @@
 # src/services/bordas.py
 import cv2
 import numpy as np
+from src.services.instrumentacao import PERFIL_NULO
+
+# Presets de limiares usados pelo pipeline de detecção (threshold1, threshold2)
+CANNY_PRESETS = [(50, 150), (100, 200), (150, 250)]
 
 # Classe para detecção de bordas usando o algoritmo Canny
 class Bordas:
@@ -15,4 +19,33 @@ class Bordas:
           - threshold2: Segundo limiar para o procedimento de histerese.
         """
         bordas = cv2.Canny(imagem_gray, threshold1, threshold2)
-        return bordas
\ No newline at end of file
+        return bordas
+
+    @staticmethod
+    def gradientes(imagem_gray):
+        """
+        Calcula as derivadas Sobel (dx, dy) em 16 bits, exatamente como o cv2.Canny faz
+        internamente (abertura 3, borda replicada).
+        """
+        dx = cv2.Sobel(imagem_gray, cv2.CV_16S, 1, 0, ksize=3, borderType=cv2.BORDER_REPLICATE)
+        dy = cv2.Sobel(imagem_gray, cv2.CV_16S, 0, 1, ksize=3, borderType=cv2.BORDER_REPLICATE)
+        return dx, dy
+
+    @staticmethod
+    def executarMulti(imagem_gray, presets=CANNY_PRESETS, perfil=None):
+        """
+        Canny com vários pares de limiares sobre a MESMA imagem.
+        Os gradientes Sobel são calculados uma única vez e reaproveitados em cada preset
+        (sobrecarga cv2.Canny(dx, dy, ...)); o resultado é idêntico a chamar
+        Bordas.executar uma vez por preset.
+        Retorna a lista de mapas de bordas, na ordem de `presets`.
+        `perfil`: Perfil opcional (instrumentacao) para registrar o tempo de cada etapa.
+        """
+        perfil = perfil or PERFIL_NULO
+        with perfil.etapa("sobel"):
+            dx, dy = Bordas.gradientes(imagem_gray)
+        bordas = []
+        for (t1, t2) in presets:
+            with perfil.etapa(f"canny_{t1}_{t2}"):
+                bordas.append(cv2.Canny(dx, dy, t1, t2))
+        return bordas
@@ -0,0 +1,154 @@
+# src/services/buscaPlaca.py
+
+import re
+
+from sqlalchemy import text, column, literal_column
+
+from src.services.validacao import Validacao
+
+TABELA_FTS = "acessos_fts"
+
+
+def _classesConfusao():
+    """
+    Agrupa os caracteres que o OCR confunde (pares de Validacao.mapa_numero/mapa_letra)
+    e retorna {caractere: representante da classe} (o representante é o menor dígito, ex.: O/Q/D -> 0).
+    """
+    pai = {}
+    def raiz(c):
+        while pai.setdefault(c, c) != c:
+            c = pai[c]
+        return c
+    for mapa in (Validacao.mapa_numero, Validacao.mapa_letra):
+        for a, b in mapa.items():
+            ra, rb = raiz(a), raiz(b)
+            if ra != rb:
+                # Dígito tem prioridade como representante (e, entre dígitos, o menor)
+                ra, rb = sorted((ra, rb), key=lambda c: (not c.isdigit(), c))
+                pai[rb] = ra
+    return {c: raiz(c) for c in pai if raiz(c) != c}
+
+
+CLASSES_CONFUSAO = _classesConfusao()
+
+
+class BuscaPlaca:
+    """
+    Busca de placa por trecho usando uma tabela virtual FTS5 com tokenizador trigram
+    (acessos_fts, rowid = acessos.id), mantida em sincronia por triggers.
+    Cada registro é indexado duas vezes:
+      - plate_text: o texto como foi salvo (busca exata por trecho);
+      - plate_canon: o texto com os caracteres confundíveis trocados pelo representante da
+        classe (CLASSES_CONFUSAO), para a busca aproximada tolerar O/0, B/8, S/5...
+    Trechos com menos de 3 caracteres não formam trigramas e viram um LIKE sobre a tabela FTS.
+    """
+    _disponivel = False
+
+    @staticmethod
+    def limpar(trecho: str) -> str:
+        return re.sub(r'[^A-Z0-9]', '', (trecho or "").upper())
+
+    @staticmethod
+    def canonizar(trecho: str) -> str:
+        """ Versão Python da normalização de plate_canon. """
+        return "".join(CLASSES_CONFUSAO.get(c, c) for c in BuscaPlaca.limpar(trecho))
+
+    @staticmethod
+    def expressaoCanonicaSql(expr: str) -> str:
+        """ Mesma normalização de canonizar(), como expressão SQL (usada nos triggers). """
+        sql = f"upper({expr})"
+        for origem, destino in sorted(CLASSES_CONFUSAO.items()):
+            sql = f"replace({sql}, '{origem}', '{destino}')"
+        return sql
+
+    @staticmethod
+    def _sqlTriggers():
+        """ Nome -> CREATE TRIGGER que mantém acessos_fts em sincronia com acessos. """
+        canon_new = BuscaPlaca.expressaoCanonicaSql("new.plate_text")
+        return {
+            f"{TABELA_FTS}_ai":
+                f"CREATE TRIGGER {TABELA_FTS}_ai AFTER INSERT ON acessos BEGIN "
+                f"INSERT INTO {TABELA_FTS}(rowid, plate_text, plate_canon) "
+                f"VALUES (new.id, new.plate_text, {canon_new}); END",
+            f"{TABELA_FTS}_ad":
+                f"CREATE TRIGGER {TABELA_FTS}_ad AFTER DELETE ON acessos BEGIN "
+                f"DELETE FROM {TABELA_FTS} WHERE rowid = old.id; END",
+            f"{TABELA_FTS}_au":
+                f"CREATE TRIGGER {TABELA_FTS}_au AFTER UPDATE OF plate_text ON acessos BEGIN "
+                f"DELETE FROM {TABELA_FTS} WHERE rowid = old.id; "
+                f"INSERT INTO {TABELA_FTS}(rowid, plate_text, plate_canon) "
+                f"VALUES (new.id, new.plate_text, {canon_new}); END",
+        }
+
+    @staticmethod
+    def criarIndice(engine):
+        """
+        Cria a tabela FTS5 + triggers (se faltarem) e indexa os registros já existentes.
+        Os triggers gravados no banco são comparados com os atuais: se a normalização mudou
+        (CLASSES_CONFUSAO, ou seja, os mapas da Validacao), eles são recriados e plate_canon
+        é recalculado para todos os registros.
+        """
+        triggers = BuscaPlaca._sqlTriggers()
+        try:
+            with engine.begin() as conn:
+                existia = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nome"), {"nome": TABELA_FTS}).first()
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} "
+                    f"USING fts5(plate_text, plate_canon, tokenize = 'trigram')"))
+                gravados = dict(conn.execute(text(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'acessos'")).all())
+                desatualizados = [nome for nome, sql in triggers.items() if gravados.get(nome) != sql]
+                for nome in desatualizados:
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {nome}"))
+                    conn.execute(text(triggers[nome]))
+                if existia and any(gravados.get(nome) for nome in desatualizados):
+                    print("[INFO] Normalização da busca por placa mudou: reconstruindo o índice FTS.")
+                    conn.execute(text(f"DELETE FROM {TABELA_FTS}"))
+                    existia = None
+                if not existia:
+                    conn.execute(text(
+                        f"INSERT INTO {TABELA_FTS}(rowid, plate_text, plate_canon) "
+                        f"SELECT id, plate_text, {BuscaPlaca.expressaoCanonicaSql('plate_text')} FROM acessos"))
+            BuscaPlaca._disponivel = True
+        except Exception as e:
+            # SQLite sem FTS5/trigram (anterior à 3.34): a busca continua funcionando via LIKE
+            print(f"[WARN] Índice de busca por placa (FTS5) indisponível, usando LIKE: {e}")
+            BuscaPlaca._disponivel = False
+        return BuscaPlaca._disponivel
+
+    @staticmethod
+    def disponivel(db) -> bool:
+        """ True se a tabela FTS existe no banco (verificado uma vez por processo quando positivo). """
+        if not BuscaPlaca._disponivel:
+            BuscaPlaca._disponivel = db.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nome"), {"nome": TABELA_FTS}).first() is not None
+        return BuscaPlaca._disponivel
+
+    @staticmethod
+    def filtro(db, coluna_id, coluna_placa, trecho: str, aproximada: bool = False):
+        """
+        Retorna a condição SQLAlchemy que seleciona os registros cuja placa contém `trecho`
+        (com `aproximada`, tolerando as confusões do OCR). Usa o índice FTS quando possível.
+        """
+        if aproximada:
+            busca, coluna_fts = BuscaPlaca.canonizar(trecho), "plate_canon"
+        else:
+            busca, coluna_fts = BuscaPlaca.limpar(trecho), "plate_text"
+        if not busca:
+            return coluna_placa.ilike(f"%{trecho}%")
+
+        if BuscaPlaca.disponivel(db):
+            if len(busca) >= 3:
+                # Trecho entre aspas = frase: os trigramas precisam aparecer em sequência
+                sql, parametro = f"SELECT rowid FROM {TABELA_FTS} WHERE {coluna_fts} MATCH :busca", f'"{busca}"'
+            else:
+                # Curto demais para trigramas: varre a coluna já normalizada (sem refazer os replace)
+                sql, parametro = f"SELECT rowid FROM {TABELA_FTS} WHERE {coluna_fts} LIKE :busca", f"%{busca}%"
+            ids = text(sql).bindparams(busca=parametro).columns(column("rowid"))
+            return coluna_id.in_(ids)
+
+        if aproximada:
+            canon = literal_column(BuscaPlaca.expressaoCanonicaSql("acessos.plate_text"))
+            return canon.like(f"%{busca}%")
+        return coluna_placa.ilike(f"%{busca}%")
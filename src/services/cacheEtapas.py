@@ -0,0 +1,76 @@
+# src/services/cacheEtapas.py
+
+import os
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from src.services.bordas import CANNY_PRESETS
+from src.services.detectorHaar import DetectorHaar
+from src.services.filtrarContornos import PESO_ASPECTO, PESO_SEGMENTACAO, PESO_SOLIDEZ
+from src.services.cacheResultados import impressaoDigital
+
+# Mude ao alterar a lógica de detecção/recorte: invalida o que já está no disco
+VERSAO_DETECCAO = 1
+
+
+def impressaoDeteccao(**config) -> str:
+    """ Impressão digital da configuração das etapas de detecção + recorte (mais os parâmetros dados). """
+    return impressaoDigital(
+        versao=VERSAO_DETECCAO, canny=tuple(CANNY_PRESETS), haar=tuple(sorted(DetectorHaar._config.items())),
+        pesos=(PESO_ASPECTO, PESO_SEGMENTACAO, PESO_SOLIDEZ), **config)
+
+
+class CacheEtapas:
+    """
+    Cache em disco da saída da detecção (quads ranqueados + recortes dos candidatos) por imagem,
+    para experimentos que só mexem do OCR em diante (limiar de azul, motor de OCR...)
+    começarem direto no OCR. Um .npz comprimido por chave; a chave é o caminho da imagem
+    (com tamanho e data de modificação do arquivo) + impressão digital da configuração.
+    Seguro entre processos: cada arquivo é gravado num temporário e renomeado.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def chave(img_path, impressao: str) -> str:
+        caminho = Path(img_path).resolve()
+        info = caminho.stat()
+        texto = f"{caminho}|{info.st_size}|{info.st_mtime_ns}|{impressao}"
+        return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+    def _caminho(self, chave):
+        return self.diretorio / f"{chave}.npz"
+
+    def carregar(self, chave):
+        """ Retorna {"quads": [4x2 float32], "recortes": [(rank, crop_bgr)]} ou None. """
+        caminho = self._caminho(chave)
+        if not caminho.exists(): return None
+        try:
+            with np.load(caminho, allow_pickle=False) as dados:
+                quads = list(dados["quads"])
+                ranks = dados["ranks"].tolist()
+                recortes = [(rank, dados[f"recorte_{j}"]) for j, rank in enumerate(ranks)]
+            return {"quads": quads, "recortes": recortes}
+        except Exception as e:
+            print(f"WARN: Cache de etapas corrompido ({caminho.name}), recalculando: {e}")
+            return None
+
+    def guardar(self, chave, quads, recortes):
+        """ `quads`: quads ranqueados (4x2); `recortes`: lista de (rank, crop_bgr). """
+        arrays = {
+            "quads": np.asarray(quads, dtype=np.float32).reshape(-1, 4, 2),
+            "ranks": np.asarray([rank for rank, _ in recortes], dtype=np.int32),
+        }
+        for j, (_, crop) in enumerate(recortes):
+            arrays[f"recorte_{j}"] = crop
+        temporario = self.diretorio / f"{chave}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez_compressed(temporario, **arrays)
+            os.replace(temporario, self._caminho(chave))
+        except Exception as e:
+            print(f"WARN: Não foi possível gravar o cache de etapas: {e}")
+            if temporario.exists(): temporario.unlink()
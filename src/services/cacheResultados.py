@@ -0,0 +1,118 @@
+# src/services/cacheResultados.py
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+import numpy as np
+
+# Quantos resultados ficam na memória (LRU) e, opcionalmente, onde fica a camada em disco.
+# CACHE_RESULTADOS_TAMANHO=0 desliga o cache; sem CACHE_RESULTADOS_DIR não há camada em disco.
+TAMANHO_CACHE_PADRAO = int(os.environ.get("CACHE_RESULTADOS_TAMANHO", "256"))
+DIR_CACHE_PADRAO = os.environ.get("CACHE_RESULTADOS_DIR") or None
+
+
+def impressaoDigital(**config) -> str:
+    """ Hash curto da configuração do pipeline: qualquer parâmetro diferente gera outra chave. """
+    return hashlib.sha1(repr(sorted(config.items())).encode("utf-8")).hexdigest()[:16]
+
+
+class CacheResultados:
+    """
+    Cache de resultados do pipeline por conteúdo: a chave é o hash dos pixels DECODIFICADOS
+    (o mesmo arquivo reenviado, ou recodificado sem perdas, cai na mesma entrada) mais a
+    impressão digital da configuração. Camada em memória (LRU) + camada opcional em disco
+    (um .npz por chave, sobrevive a reinícios). Thread-safe.
+
+    Cada entrada é um dict com "status", "texto_final", "padrao", "quad", "quad_anotacao" e "crop".
+    """
+
+    def __init__(self, tamanho: int = TAMANHO_CACHE_PADRAO, diretorio: str = DIR_CACHE_PADRAO):
+        self.tamanho = max(0, int(tamanho))
+        self.diretorio = Path(diretorio) if diretorio else None
+        if self.diretorio: self.diretorio.mkdir(parents=True, exist_ok=True)
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self.estatisticas = {"acertos_memoria": 0, "acertos_disco": 0, "falhas": 0}
+
+    @property
+    def ativo(self) -> bool:
+        return self.tamanho > 0 or self.diretorio is not None
+
+    @staticmethod
+    def chave(img_bgr, impressao: str) -> str:
+        h = hashlib.blake2b(digest_size=20)
+        h.update(f"{img_bgr.shape}|{img_bgr.dtype}|{impressao}".encode("utf-8"))
+        h.update(np.ascontiguousarray(img_bgr).data)
+        return h.hexdigest()
+
+    def obter(self, chave: str):
+        """ Retorna (entrada, origem) com origem "memoria"/"disco", ou (None, None). """
+        with self._lock:
+            entrada = self._memoria.get(chave)
+            if entrada is not None:
+                self._memoria.move_to_end(chave)
+                self.estatisticas["acertos_memoria"] += 1
+                return entrada, "memoria"
+
+        entrada = self._lerDisco(chave)
+        with self._lock:
+            if entrada is None:
+                self.estatisticas["falhas"] += 1
+                return None, None
+            self.estatisticas["acertos_disco"] += 1
+        self._guardarMemoria(chave, entrada)
+        return entrada, "disco"
+
+    def guardar(self, chave: str, entrada: dict):
+        self._guardarMemoria(chave, entrada)
+        self._gravarDisco(chave, entrada)
+
+    def limpar(self):
+        """ Esvazia a camada em memória (a camada em disco é mantida). """
+        with self._lock:
+            self._memoria.clear()
+
+    def _guardarMemoria(self, chave, entrada):
+        if self.tamanho <= 0: return
+        with self._lock:
+            self._memoria[chave] = entrada
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.tamanho:
+                self._memoria.popitem(last=False)
+
+    def _caminho(self, chave):
+        return self.diretorio / f"{chave}.npz"
+
+    def _gravarDisco(self, chave, entrada):
+        if self.diretorio is None: return
+        meta = {k: entrada.get(k) for k in ("status", "texto_final", "padrao")}
+        arrays = {k: np.asarray(entrada[k]) for k in ("quad", "quad_anotacao", "crop") if entrada.get(k) is not None}
+        temporario = self.diretorio / f"{chave}.{threading.get_ident()}.tmp.npz"
+        try:
+            np.savez_compressed(temporario, meta=np.array(json.dumps(meta)), **arrays)
+            os.replace(temporario, self._caminho(chave))
+        except Exception as e:
+            print(f"[WARN] Não foi possível gravar o cache em disco: {e}")
+            if temporario.exists(): temporario.unlink()
+
+    def _lerDisco(self, chave):
+        if self.diretorio is None: return None
+        caminho = self._caminho(chave)
+        if not caminho.exists(): return None
+        try:
+            with np.load(caminho, allow_pickle=False) as dados:
+                entrada = json.loads(str(dados["meta"]))
+                for k in ("quad", "quad_anotacao", "crop"):
+                    entrada[k] = dados[k] if k in dados.files else None
+            return entrada
+        except Exception as e:
+            print(f"[WARN] Entrada de cache corrompida ({caminho.name}), ignorando: {e}")
+            return None
+
+
+# Cache do processo (usado pelo PlacaController).
+CACHE_RESULTADOS = CacheResultados()
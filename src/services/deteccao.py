@@ -0,0 +1,83 @@
+# src/services/deteccao.py
+
+import cv2
+import numpy as np
+
+from src.services.preprocessamento import Preprocessamento
+from src.services.bordas import Bordas, CANNY_PRESETS
+from src.services.contornos import Contornos
+from src.services.detectorHaar import DetectorHaar
+from src.services.filtrarContornos import FiltrarContornos
+from src.services.instrumentacao import PERFIL_NULO
+
+
+class Deteccao:
+    """
+    Front-end de detecção (pré-processamento -> Canny -> contornos -> Haar -> filtro/ranking),
+    com suporte a rodar numa cópia reduzida da imagem (coarse-to-fine).
+    Os contornos e detecções do Haar são levados de volta às coordenadas ORIGINAIS antes do
+    filtro, então os quads dos candidatos valem para a imagem em resolução cheia e o
+    Recorte continua sendo feito a partir dela.
+    """
+
+    @staticmethod
+    def reduzir(img_bgr, escala: float):
+        """ Retorna a cópia reduzida da imagem (ou a própria imagem se escala >= 1). """
+        if escala is None or escala >= 1.0:
+            return img_bgr
+        return cv2.resize(img_bgr, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def executar(img_bgr, escala: float = 1.0, presets=CANNY_PRESETS, top_k: int = None, estatisticas=None,
+                 perfil=None):
+        """
+        Executa a detecção completa e retorna um dict com:
+          - "candidatos": lista ranqueada de FiltrarContornos (quads em coordenadas originais)
+          - "preproc": imagem pré-processada (na resolução de detecção)
+          - "bordas": lista de mapas de bordas, um por preset (na resolução de detecção)
+          - "contornos": todos os contornos, em coordenadas originais
+          - "escala": escala efetivamente usada na detecção
+
+        Parâmetros:
+          - escala: fator de redução da imagem para a detecção (ex.: 0.5 = metade da
+                    resolução). 1.0 mantém o comportamento original.
+          - top_k: quantos candidatos (pelo ranking geométrico) recebem a pontuação cara
+                   de segmentação/cor; None pontua todos.
+          - estatisticas: dict opcional repassado ao FiltrarContornos.
+          - perfil: Perfil opcional (instrumentacao); recebe o tempo de cada etapa e as
+                    contagens de candidatos (prefixo "candidatos_").
+        """
+        perfil = perfil or PERFIL_NULO
+        if estatisticas is None: estatisticas = {}
+        escala = 1.0 if escala is None or escala >= 1.0 else float(escala)
+        with perfil.etapa("reducao"):
+            img_det = Deteccao.reduzir(img_bgr, escala)
+
+        with perfil.etapa("preprocessamento"):
+            preproc = Preprocessamento.executar(img_det)
+        bordas = Bordas.executarMulti(preproc, presets, perfil=perfil)
+        todos_os_contornos = []
+        for edges in bordas:
+            with perfil.etapa("contornos"):
+                todos_os_contornos.extend(Contornos.executar(edges))
+
+        with perfil.etapa("haar"):
+            gray_det = cv2.cvtColor(img_det, cv2.COLOR_BGR2GRAY)
+            quads_haar = DetectorHaar.executar(gray_det, escala=escala)
+
+        # Leva os contornos de volta à resolução original (o filtro usa limiares em pixels originais)
+        if escala != 1.0:
+            with perfil.etapa("contornos_reescala"):
+                todos_os_contornos = [np.round(c / escala).astype(np.int32) for c in todos_os_contornos]
+
+        candidatos = FiltrarContornos.executar(todos_os_contornos, img_bgr, quads_haar=quads_haar,
+                                               top_k=top_k, estatisticas=estatisticas, perfil=perfil)
+        for nome, valor in estatisticas.items():
+            perfil.definir(f"candidatos_{nome}", valor)
+        return {
+            "candidatos": candidatos,
+            "preproc": preproc,
+            "bordas": bordas,
+            "contornos": todos_os_contornos,
+            "escala": escala,
+        }
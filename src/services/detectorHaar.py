@@ -0,0 +1,107 @@
+# src/services/detectorHaar.py
+
+import threading
+
+import cv2
+import numpy as np
+
+CASCADE_PLACA = "haarcascade_russian_plate_number.xml"
+
+# Parâmetros padrão do detectMultiScale (iguais aos usados originalmente em FiltrarContornos).
+# - scale_factor: passo da pirâmide de escalas (1.05 = muitas escalas, mais lento; 1.1+ = mais rápido)
+# - min_neighbors: quantas detecções vizinhas confirmam uma placa
+# - min_size / max_size: tamanhos mínimo/máximo da janela, em pixels da imagem ORIGINAL
+# - largura_max: se definida, a imagem é reduzida para essa largura antes da detecção
+CONFIG_HAAR_PADRAO = {
+    "scale_factor": 1.05,
+    "min_neighbors": 3,
+    "min_size": (40, 15),
+    "max_size": None,
+    "largura_max": None,
+}
+
+
+class DetectorHaar:
+    """
+    Registro de classificadores Haar: cada XML é lido do disco uma única vez por processo
+    e reaproveitado por todas as chamadas (o CascadeClassifier não é recriado por imagem).
+    O detectMultiScale altera o estado interno do classificador, então cada cascade tem
+    seu lock de execução (sessões do Streamlit rodam em threads do mesmo processo).
+    """
+    _cascades = {}
+    _locks_execucao = {}
+    _config = dict(CONFIG_HAAR_PADRAO)
+    _lock = threading.Lock()
+
+    @classmethod
+    def configurar(cls, **parametros):
+        """ Ajusta os parâmetros padrão de detecção (chaves de CONFIG_HAAR_PADRAO). """
+        desconhecidos = set(parametros) - set(CONFIG_HAAR_PADRAO)
+        if desconhecidos:
+            raise ValueError(f"Parâmetros desconhecidos para o Haar: {sorted(desconhecidos)}")
+        with cls._lock:
+            cls._config.update(parametros)
+
+    @classmethod
+    def carregar(cls, nome_xml: str = CASCADE_PLACA):
+        """ Retorna o CascadeClassifier do registro (carregando-o na primeira vez) ou None se falhar. """
+        cascade = cls._cascades.get(nome_xml)
+        if cascade is not None:
+            return cascade
+        with cls._lock:
+            if nome_xml not in cls._cascades:
+                try:
+                    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + nome_xml)
+                    if cascade.empty(): cascade = None
+                except Exception:
+                    cascade = None
+                if cascade is None: print(f"[WARNING] Haar Cascade '{nome_xml}' não pôde ser carregado.")
+                cls._locks_execucao[nome_xml] = threading.Lock()
+                cls._cascades[nome_xml] = cascade
+            return cls._cascades[nome_xml]
+
+    @classmethod
+    def executar(cls, gray, escala: float = 1.0, nome_xml: str = CASCADE_PLACA, **parametros):
+        """
+        Detecta placas com o Haar Cascade e retorna a lista de quads (4x2 float32)
+        em coordenadas da imagem ORIGINAL.
+
+        Parâmetros:
+          - gray: imagem em tons de cinza. Pode já estar reduzida; nesse caso informe `escala`
+                  (ex.: 0.5 se a imagem tem metade do tamanho da original).
+          - escala: fator de escala de `gray` em relação à imagem original.
+          - parametros: sobrescrevem CONFIG_HAAR_PADRAO só nesta chamada.
+        """
+        cascade = cls.carregar(nome_xml)
+        if cascade is None or gray is None or gray.size == 0:
+            return []
+        config = {**cls._config, **parametros}
+
+        # Redução adicional (pirâmide base menor) se a imagem for mais larga que largura_max
+        largura_max = config["largura_max"]
+        if largura_max and gray.shape[1] > largura_max:
+            fator = largura_max / gray.shape[1]
+            gray = cv2.resize(gray, None, fx=fator, fy=fator, interpolation=cv2.INTER_AREA)
+            escala *= fator
+
+        def _em_escala(tamanho):
+            if tamanho is None: return None
+            return (max(1, int(round(tamanho[0] * escala))), max(1, int(round(tamanho[1] * escala))))
+
+        kwargs = {"scaleFactor": config["scale_factor"], "minNeighbors": config["min_neighbors"],
+                  "minSize": _em_escala(config["min_size"])}
+        if config["max_size"] is not None:
+            kwargs["maxSize"] = _em_escala(config["max_size"])
+
+        try:
+            with cls._locks_execucao[nome_xml]:
+                detections = cascade.detectMultiScale(gray, **kwargs)
+        except Exception:
+            print("[WARNING] Erro no Haar Cascade.")
+            return []
+
+        quads = []
+        for (x, y, w, h) in detections:
+            quad = np.array([[x, y], [x+w, y], [x+w, y+h], [x, y+h]], dtype="float32")
+            quads.append((quad / escala).astype("float32"))
+        return quads
@@ -4,6 +4,8 @@ import cv2
 import numpy as np
 from src.services.binarizacao import Binarizacao
 from src.services.analiseCor import AnaliseCor
+from src.services.detectorHaar import DetectorHaar
+from src.services.instrumentacao import PERFIL_NULO
 
 ASPECT_PATTERNS = {
     "BR_carro_antiga": (3.08, 0.20),
@@ -11,6 +13,15 @@ ASPECT_PATTERNS = {
     "BR_moto": (1.18, 0.15)
 }
 
+# Pesos do score final: aspecto + segmentação + solidez.
+# O score de segmentação (Binarizacao._avaliar_qualidade) fica em [0, 1], então a parte "cara"
+# soma no máximo PESO_SEGMENTACAO ao score geométrico — base da parada antecipada.
+PESO_ASPECTO, PESO_SEGMENTACAO, PESO_SOLIDEZ = 1.0, 4.0, 0.5
+# No NMS, quase-duplicatas cujo score barato difere até isto são consideradas empatadas e a
+# sobrevivente é a mais retangular (solidez): uma diferença de 1px no minAreaRect muda o score
+# barato na 3ª casa, mas a mais retangular é a que costuma segmentar melhor (score final maior).
+TOLERANCIA_EMPATE_NMS = 0.01
+
 class FiltrarContornos:
     
     # --- (Funções faixa, ordenarPontos, aspectRatio, _calcular_score_segmentacao, 
@@ -82,56 +93,142 @@ class FiltrarContornos:
         return quad_encolhido.astype(np.float32)
 
     @staticmethod
-    def executar(contornos, imagem_bgr):
-        candidatos, gray = [], cv2.cvtColor(imagem_bgr, cv2.COLOR_BGR2GRAY)
+    def supressaoNaoMaxima(quads, prioridades, iou_limite=0.85, desempates=None, tolerancia=0.0):
+        """
+        NMS vetorizado: entre quads que se sobrepõem com IoU >= iou_limite, mantém só o de
+        maior prioridade. O IoU é calculado sobre a caixa alinhada aos eixos que envolve cada
+        quad (o minAreaRect já vem em `quad`), o que basta para colapsar quase-duplicatas.
+        Com `desempates`, os membros do grupo com prioridade a até `tolerancia` da maior contam
+        como empatados e fica o de maior desempate.
+        Retorna os índices mantidos, em ordem decrescente de prioridade.
+        """
+        if len(quads) == 0: return []
+        pts = np.asarray(quads, dtype=np.float32).reshape(len(quads), 4, 2)
+        x1, y1 = pts[:, :, 0].min(axis=1), pts[:, :, 1].min(axis=1)
+        x2, y2 = pts[:, :, 0].max(axis=1), pts[:, :, 1].max(axis=1)
+        areas = (x2 - x1) * (y2 - y1)
+
+        prioridades = np.asarray(prioridades, dtype=np.float64)
+        ordem = np.argsort(-prioridades, kind="stable")
+        mantidos = []
+        while ordem.size > 0:
+            i, resto = ordem[0], ordem[1:]
+            inter_w = np.clip(np.minimum(x2[i], x2[resto]) - np.maximum(x1[i], x1[resto]), 0, None)
+            inter_h = np.clip(np.minimum(y2[i], y2[resto]) - np.maximum(y1[i], y1[resto]), 0, None)
+            inter = inter_w * inter_h
+            iou = inter / np.maximum(areas[i] + areas[resto] - inter, 1e-6)
+            if desempates is not None:
+                grupo = resto[iou >= iou_limite]
+                empatados = [i] + [j for j in grupo if prioridades[i] - prioridades[j] <= tolerancia]
+                i = max(empatados, key=lambda j: desempates[j])  # max() fica com o primeiro em empate exato
+            mantidos.append(int(i))
+            ordem = resto[iou < iou_limite]
+        return mantidos
+
+    @staticmethod
+    def executar(contornos, imagem_bgr, quads_haar=None, iou_nms=0.85, top_k=None, manter=5, estatisticas=None,
+                 perfil=None):
+        """
+        Gera, pontua e ordena os candidatos a placa.
+        `quads_haar`: detecções do Haar já calculadas para esta imagem (ex.: numa versão reduzida
+        via DetectorHaar.executar); se None, o detector roda aqui sobre a imagem em cinza.
+        `iou_nms`: limiar do NMS que colapsa candidatos quase idênticos (vindos dos vários
+        presets do Canny) antes da pontuação cara; None desativa.
+        `top_k`: só os K melhores pelo score geométrico (aspecto, solidez, área) recebem a
+        pontuação cara (warp + binarização + cor); None pontua todos.
+        `manter`: quantos candidatos do topo precisam sair na ordem exata (o fallback usa 5).
+        Quando já há `manter` candidatos pontuados e o próximo, mesmo com segmentação perfeita,
+        não alcança o `manter`-ésimo score, a pontuação para (sem mudar o topo). None desativa.
+        `estatisticas`: dict opcional preenchido com contagens de candidatos
+        ("gerados", "na_faixa", "podados_nms", "pontuados").
+        `perfil`: Perfil opcional (instrumentacao) para registrar o tempo de cada etapa.
+        """
+        candidatos = []
+        if estatisticas is None: estatisticas = {}
+        perfil = perfil or PERFIL_NULO
         
         # --- GERAÇÃO DE CANDIDATOS (Haar e Contornos) ---
-        try:
-            cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_russian_plate_number.xml")
-            if not cascade.empty():
-                detections = cascade.detectMultiScale(gray, scaleFactor=1.05, minNeighbors=3, minSize=(40, 15))
-                for (x, y, w, h) in detections:
-                    quad = np.array([[x, y], [x+w, y], [x+w, y+h], [x, y+h]], dtype="float32")
-                    candidatos.append({"quad": quad, "method": "haar"})
-        except Exception: print("[WARNING] Erro no Haar Cascade.")
-
-        for contour in contornos:
-            if not FiltrarContornos.validacaoGeometrica(contour, imagem_bgr.shape): continue
-            quad_approx = cv2.boxPoints(cv2.minAreaRect(contour)).reshape(-1, 1, 2)
-            quad = FiltrarContornos.ordenarPontos(quad_approx.reshape(4, 2).astype("float32"))
-            candidatos.append({"quad": quad, "method": "contour", "contour_ref": contour})
+        if quads_haar is None:
+            with perfil.etapa("haar"):
+                quads_haar = DetectorHaar.executar(cv2.cvtColor(imagem_bgr, cv2.COLOR_BGR2GRAY))
+        for quad in quads_haar:
+            candidatos.append({"quad": quad, "method": "haar"})
+
+        with perfil.etapa("candidatos_geracao"):
+            for contour in contornos:
+                if not FiltrarContornos.validacaoGeometrica(contour, imagem_bgr.shape): continue
+                quad_approx = cv2.boxPoints(cv2.minAreaRect(contour)).reshape(-1, 1, 2)
+                quad = FiltrarContornos.ordenarPontos(quad_approx.reshape(4, 2).astype("float32"))
+                candidatos.append({"quad": quad, "method": "contour", "contour_ref": contour})
 
+        estatisticas["gerados"] = len(candidatos)
         if not candidatos: return []
+
+        # --- PRÉ-SELEÇÃO BARATA (geometria) ---
+        candidatos_na_faixa = []
+        with perfil.etapa("candidatos_geometria"):
+            for cand in candidatos:
+                ratio, avg_w, avg_h = FiltrarContornos.aspectRatio(cand["quad"])
+                pattern, ar_score = FiltrarContornos.faixa(ratio)
+                if pattern is None: continue
+                solidity = 1.0 if cand["method"] == "haar" else cv2.contourArea(cand["contour_ref"]) / max(avg_w * avg_h, 1e-6)
+                cand.update({"pattern": pattern, "score_geom": ar_score, "solidity": solidity, "area": avg_w * avg_h,
+                             "score_barato": (ar_score * PESO_ASPECTO) + (solidity * PESO_SOLIDEZ)})
+                candidatos_na_faixa.append(cand)
+        estatisticas["na_faixa"] = len(candidatos_na_faixa)
+
+        # --- NMS: colapsa quase-duplicatas (melhor score geométrico; empate -> mais retangular) ---
+        if iou_nms is not None and len(candidatos_na_faixa) > 1:
+            with perfil.etapa("candidatos_nms"):
+                mantidos = FiltrarContornos.supressaoNaoMaxima(
+                    [c["quad"] for c in candidatos_na_faixa],
+                    [c["score_barato"] for c in candidatos_na_faixa],
+                    iou_nms, desempates=[c["solidity"] for c in candidatos_na_faixa],
+                    tolerancia=TOLERANCIA_EMPATE_NMS)
+            candidatos_na_faixa = [candidatos_na_faixa[i] for i in mantidos]
+        estatisticas["podados_nms"] = estatisticas["na_faixa"] - len(candidatos_na_faixa)
+
+        # --- RANKING GEOMÉTRICO: ordem de pontuação (score barato, área como desempate) ---
+        candidatos_na_faixa.sort(key=lambda c: (c["score_barato"], c["area"]), reverse=True)
+        if top_k is not None:
+            candidatos_na_faixa = candidatos_na_faixa[:top_k]
         
         # --- PONTUAÇÃO DE CANDIDATOS (com Análise de Cor) ---
         candidatos_pontuados = []
-        for cand in candidatos:
-            quad, ratio, avg_w, avg_h = cand["quad"], *FiltrarContornos.aspectRatio(cand["quad"])
-            pattern, ar_score = FiltrarContornos.faixa(ratio)
-            if pattern is None: continue
+        scores_topo = [] # scores finais já calculados, ordem decrescente (até `manter`)
+        for cand in candidatos_na_faixa:
+            # Parada antecipada: nem com segmentação perfeita este (e os seguintes) entra no topo
+            if manter and len(scores_topo) >= manter and cand["score_barato"] + PESO_SEGMENTACAO < scores_topo[-1]:
+                break
+
+            quad, ar_score, solidity = cand["quad"], cand["score_geom"], cand["solidity"]
             
             warp_para_score = None # Inicializa
             try:
                 # Gera o warp BGR para as análises
-                warp_para_score = cv2.warpPerspective(imagem_bgr, cv2.getPerspectiveTransform(quad, np.array([[0,0],[200,0],[200,60],[0,60]], dtype="float32")), (200, 60))
+                with perfil.etapa("pontuacao_warp"):
+                    warp_para_score = cv2.warpPerspective(imagem_bgr, cv2.getPerspectiveTransform(quad, np.array([[0,0],[200,0],[200,60],[0,60]], dtype="float32")), (200, 60))
             except: continue
             
             # --- EXECUTA AS ANÁLISES ---
-            seg_score, num_chars, img_bin, char_contours = FiltrarContornos._calcular_score_segmentacao(warp_para_score)
-            analise_cores = AnaliseCor.executar(warp_para_score) 
-            
-            solidity = 1.0 if cand["method"] == "haar" else cv2.contourArea(cand["contour_ref"]) / max(avg_w * avg_h, 1e-6)
+            with perfil.etapa("pontuacao_segmentacao"):
+                seg_score, num_chars, img_bin, char_contours = FiltrarContornos._calcular_score_segmentacao(warp_para_score)
+            with perfil.etapa("pontuacao_cor"):
+                analise_cores = AnaliseCor.executar(warp_para_score) 
             
-            final_score = (ar_score * 1.0) + (seg_score * 4.0) + (solidity * 0.5)
+            final_score = (ar_score * PESO_ASPECTO) + (seg_score * PESO_SEGMENTACAO) + (solidity * PESO_SOLIDEZ)
             
             cand.update({
-                "pattern": pattern, "score": float(final_score), "score_geom": ar_score, 
+                "score": float(final_score),
                 "seg_score": seg_score, "num_chars": num_chars, 
                 "bin_image": img_bin, "char_contours": char_contours,
                 "analise_cores": analise_cores,
                 "warp_colorido": warp_para_score # <<< GUARDA O WARP COLORIDO
             })
             candidatos_pontuados.append(cand)
+            if manter:
+                scores_topo = sorted(scores_topo + [float(final_score)], reverse=True)[:manter]
+        estatisticas["pontuados"] = len(candidatos_pontuados)
         
         if not candidatos_pontuados: return []
         
@@ -139,4 +236,4 @@ class FiltrarContornos:
         candidatos_pontuados.sort(key=lambda c: c["score"], reverse=True)
         melhor_candidato = candidatos_pontuados[0]
         melhor_candidato["quad"] = FiltrarContornos._encolher_quad(melhor_candidato["quad"], fator_encolhimento=0.02)
-        return candidatos_pontuados
\ No newline at end of file
+        return candidatos_pontuados
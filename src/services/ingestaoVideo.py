@@ -0,0 +1,179 @@
+# src/services/ingestaoVideo.py
+
+import time
+import queue
+import threading
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# Parâmetros padrão do detector de movimento:
+# - largura: os frames são reduzidos para esta largura antes da comparação (barato)
+# - limiar_pixel: diferença mínima de intensidade (0-255) para um pixel contar como "em movimento"
+# - fracao_minima: fração mínima de pixels em movimento para o frame seguir para a detecção
+CONFIG_MOVIMENTO_PADRAO = {
+    "largura": 160,
+    "limiar_pixel": 25,
+    "fracao_minima": 0.01,
+}
+
+
+class DetectorMovimento:
+    """
+    Filtro de movimento por diferença entre frames consecutivos (amostrados), numa cópia
+    pequena e suavizada do frame. Custa uma fração de milissegundo por frame e descarta
+    os frames de pista vazia (ou de veículo parado) antes do pipeline de detecção.
+    """
+
+    def __init__(self, **parametros):
+        desconhecidos = set(parametros) - set(CONFIG_MOVIMENTO_PADRAO)
+        if desconhecidos:
+            raise ValueError(f"Parâmetros desconhecidos para o detector de movimento: {sorted(desconhecidos)}")
+        self.config = {**CONFIG_MOVIMENTO_PADRAO, **parametros}
+        self._anterior = None
+
+    def executar(self, frame_bgr):
+        """ Retorna (tem_movimento, fracao_de_pixels_em_movimento). O primeiro frame conta como movimento. """
+        largura = self.config["largura"]
+        h, w = frame_bgr.shape[:2]
+        pequeno = cv2.resize(frame_bgr, (largura, max(1, int(h * largura / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(pequeno, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        anterior, self._anterior = self._anterior, gray
+        if anterior is None:
+            return True, 1.0
+
+        diferenca = cv2.absdiff(gray, anterior)
+        fracao = float(np.count_nonzero(diferenca > self.config["limiar_pixel"])) / diferenca.size
+        return fracao >= self.config["fracao_minima"], fracao
+
+
+class IngestaoVideo:
+    """
+    Leitura de vídeo (arquivo, câmera V4L2 pelo índice/caminho do dispositivo ou URL de stream)
+    numa thread própria, com amostragem de frames, filtro de movimento e fila limitada.
+
+    - Fonte ao vivo (câmera/URL): se o consumidor atrasar e a fila encher, o frame MAIS ANTIGO
+      é descartado (melhor processar o carro que está passando agora do que um atrasado).
+    - Arquivo: por padrão a leitura espera o consumidor (nenhum frame é perdido).
+    - Instante de cada frame: relógio da máquina na leitura, só para fontes ao vivo. Em arquivo
+      é `inicio` (início da gravação; padrão: quando a leitura começou) + a posição do frame no
+      vídeo (CAP_PROP_POS_MSEC), senão o vídeo inteiro sairia com a hora em que foi processado.
+
+    Uso:
+        with IngestaoVideo("portao.mp4") as ingestao:
+            for indice, instante, frame_bgr in ingestao.frames():
+                ...
+    """
+
+    def __init__(self, fonte, amostragem: int = 1, movimento: bool = True, fila_max: int = 4,
+                 descartar_atrasados: bool = None, inicio: datetime = None, **parametros_movimento):
+        # "0", "1"... viram índice de câmera
+        self.fonte = int(fonte) if isinstance(fonte, str) and fonte.isdigit() else fonte
+        self.amostragem = max(1, int(amostragem))
+        self.detector = DetectorMovimento(**parametros_movimento) if movimento else None
+        self.ao_vivo = isinstance(self.fonte, int) or \
+            str(self.fonte).startswith(("/dev/", "rtsp://", "http://", "https://"))
+        self.descartar_atrasados = self.ao_vivo if descartar_atrasados is None else descartar_atrasados
+        self.inicio = inicio
+        self.fila = queue.Queue(maxsize=max(1, fila_max))
+        self.estatisticas = {"lidos": 0, "amostrados": 0, "com_movimento": 0, "descartados_fila": 0, "entregues": 0}
+        self._parar = threading.Event()
+        self._thread = None
+        self._captura = None
+
+    _FIM = object()
+
+    def iniciar(self):
+        self._captura = cv2.VideoCapture(self.fonte)
+        if not self._captura.isOpened():
+            raise ValueError(f"Não foi possível abrir a fonte de vídeo: {self.fonte}")
+        self._inicio_s = self.inicio.timestamp() if self.inicio is not None else time.time()
+        self._thread = threading.Thread(target=self._ler, name="IngestaoVideo", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            # Libera a thread se ela estiver esperando espaço na fila
+            try:
+                while True: self.fila.get_nowait()
+            except queue.Empty:
+                pass
+            self._thread.join(timeout=5)
+        if self._captura is not None:
+            self._captura.release()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *_):
+        self.parar()
+
+    def _enfileirar(self, item):
+        if not self.descartar_atrasados:
+            while not self._parar.is_set():
+                try:
+                    self.fila.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            return
+        while True:
+            try:
+                self.fila.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.fila.get_nowait()  # descarta o frame mais antigo
+                    self.estatisticas["descartados_fila"] += 1
+                except queue.Empty:
+                    pass
+
+    def _instante(self, indice: int) -> float:
+        """ Instante (epoch, segundos) do frame recém-lido. """
+        if self.ao_vivo:
+            return time.time()
+        posicao_ms = self._captura.get(cv2.CAP_PROP_POS_MSEC)
+        if not posicao_ms and indice:
+            # Backend sem timestamp do frame: estima pela taxa de quadros
+            fps = self._captura.get(cv2.CAP_PROP_FPS)
+            posicao_ms = indice * 1000.0 / fps if fps > 0 else 0.0
+        return self._inicio_s + posicao_ms / 1000.0
+
+    def _ler(self):
+        indice = -1
+        try:
+            while not self._parar.is_set():
+                ok, frame = self._captura.read()
+                if not ok or frame is None:
+                    break
+                indice += 1
+                self.estatisticas["lidos"] += 1
+                if indice % self.amostragem:
+                    continue
+                self.estatisticas["amostrados"] += 1
+                if self.detector is not None:
+                    tem_movimento, _ = self.detector.executar(frame)
+                    if not tem_movimento:
+                        continue
+                self.estatisticas["com_movimento"] += 1
+                self._enfileirar((indice, self._instante(indice), frame))
+        finally:
+            # Sinal de fim para o consumidor (espera vaga: o fim nunca é descartado)
+            while True:
+                try:
+                    self.fila.put(self._FIM, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self._parar.is_set(): break
+
+    def frames(self):
+        """ Gera (indice_do_frame, instante_do_frame, frame_bgr) dos frames aprovados, até o fim da fonte. """
+        while True:
+            item = self.fila.get()
+            if item is self._FIM:
+                return
+            self.estatisticas["entregues"] += 1
+            yield item
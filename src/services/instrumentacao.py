@@ -0,0 +1,148 @@
+# src/services/instrumentacao.py
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Limites (em ms) dos baldes dos histogramas de latência por etapa.
+BALDES_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+class Perfil:
+    """
+    Registro leve de tempo de parede e número de chamadas por etapa do pipeline,
+    mais contadores livres (candidatos gerados, rank vencedor, ...), de UMA requisição.
+    Custa só um time.perf_counter() por etapa, então pode ficar ligado em produção.
+
+    Uso:
+        perfil = Perfil()
+        with perfil.etapa("preprocessamento"):
+            ...
+        perfil.contar("chamadas_ocr")
+        perfil.exportar()  # -> dict serializável
+    """
+
+    def __init__(self):
+        self.etapas = {}      # nome -> [tempo_total_s, chamadas]
+        self.contadores = {}  # nome -> valor
+
+    @contextmanager
+    def etapa(self, nome: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrarTempo(nome, time.perf_counter() - inicio)
+
+    def registrarTempo(self, nome: str, segundos: float):
+        acumulado = self.etapas.setdefault(nome, [0.0, 0])
+        acumulado[0] += segundos
+        acumulado[1] += 1
+
+    def contar(self, nome: str, quantidade=1):
+        self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    def definir(self, nome: str, valor):
+        self.contadores[nome] = valor
+
+    def exportar(self) -> dict:
+        """ Retorna {"etapas": {nome: {"tempo_ms", "chamadas"}}, "contadores": {...}}. """
+        return {
+            "etapas": {nome: {"tempo_ms": tempo * 1000.0, "chamadas": chamadas}
+                       for nome, (tempo, chamadas) in self.etapas.items()},
+            "contadores": dict(self.contadores),
+        }
+
+
+class _PerfilNulo(Perfil):
+    """ Perfil que não registra nada (usado quando o chamador não pede instrumentação). """
+
+    @contextmanager
+    def etapa(self, nome: str):
+        yield
+
+    def registrarTempo(self, nome: str, segundos: float): pass
+    def contar(self, nome: str, quantidade=1): pass
+    def definir(self, nome: str, valor): pass
+
+
+PERFIL_NULO = _PerfilNulo()
+
+
+class AgregadorPerfis:
+    """
+    Agrega os perfis exportados de várias requisições em histogramas por etapa
+    (baldes fixos de BALDES_MS) e somas de contadores. Thread-safe.
+    """
+
+    def __init__(self, baldes_ms=BALDES_MS):
+        self.baldes_ms = list(baldes_ms)
+        self._lock = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        with self._lock:
+            self.requisicoes = 0
+            self.etapas = {}      # nome -> {"histograma": [...], "soma_ms", "amostras", "chamadas"}
+            self.contadores = {}  # nome -> soma (só valores numéricos)
+            self.valores = {}     # nome -> {valor: ocorrências} (ex.: rank vencedor)
+
+    def registrar(self, perfil_exportado: dict):
+        if not perfil_exportado: return
+        with self._lock:
+            self.requisicoes += 1
+            for nome, dados in perfil_exportado.get("etapas", {}).items():
+                etapa = self.etapas.setdefault(nome, {"histograma": [0] * (len(self.baldes_ms) + 1),
+                                                      "soma_ms": 0.0, "amostras": 0, "chamadas": 0})
+                etapa["histograma"][bisect.bisect_left(self.baldes_ms, dados["tempo_ms"])] += 1
+                etapa["soma_ms"] += dados["tempo_ms"]
+                etapa["amostras"] += 1
+                etapa["chamadas"] += dados.get("chamadas", 1)
+            for nome, valor in perfil_exportado.get("contadores", {}).items():
+                if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                    ocorrencias = self.valores.setdefault(nome, {})
+                    ocorrencias[valor] = ocorrencias.get(valor, 0) + 1
+                else:
+                    self.contadores[nome] = self.contadores.get(nome, 0) + valor
+
+    def _percentil(self, histograma, amostras, q):
+        """ Percentil aproximado: limite superior do balde onde cai a q-ésima amostra. """
+        alvo, acumulado = q * amostras, 0
+        for i, n in enumerate(histograma):
+            acumulado += n
+            if acumulado >= alvo and n > 0:
+                return self.baldes_ms[i] if i < len(self.baldes_ms) else float("inf")
+        return 0.0
+
+    def resumo(self) -> dict:
+        """ Por etapa: amostras, chamadas, média e p50/p95 (ms, aproximados pelos baldes), histograma. """
+        with self._lock:
+            etapas = {}
+            for nome, e in self.etapas.items():
+                etapas[nome] = {
+                    "amostras": e["amostras"], "chamadas": e["chamadas"],
+                    "total_ms": e["soma_ms"],
+                    "media_ms": e["soma_ms"] / e["amostras"] if e["amostras"] else 0.0,
+                    "p50_ms": self._percentil(e["histograma"], e["amostras"], 0.50),
+                    "p95_ms": self._percentil(e["histograma"], e["amostras"], 0.95),
+                    "histograma": list(e["histograma"]),
+                }
+            return {"requisicoes": self.requisicoes, "etapas": etapas,
+                    "contadores": dict(self.contadores),
+                    "valores": {k: dict(v) for k, v in self.valores.items()}}
+
+    def formatarTabela(self) -> str:
+        """ Tabela de texto com o detalhamento por etapa (ordenada pelo tempo total). """
+        resumo = self.resumo()
+        linhas = [f"{'Etapa':<24} {'Amostras':>8} {'Chamadas':>9} {'Média ms':>10} {'p50 ms':>8} {'p95 ms':>8} {'% tempo':>8}"]
+        etapas = sorted(resumo["etapas"].items(), key=lambda kv: kv[1]["total_ms"], reverse=True)
+        total = resumo["etapas"].get("total", {}).get("total_ms") or sum(e["total_ms"] for _, e in etapas) or 1.0
+        for nome, e in etapas:
+            linhas.append(f"{nome:<24} {e['amostras']:>8} {e['chamadas']:>9} {e['media_ms']:>10.2f} "
+                          f"{e['p50_ms']:>8g} {e['p95_ms']:>8g} {100.0 * e['total_ms'] / total:>7.1f}%")
+        return "\n".join(linhas)
+
+
+# Agregador do processo (ex.: o controller registra aqui cada imagem processada).
+AGREGADOR_GLOBAL = AgregadorPerfis()
@@ -0,0 +1,177 @@
+# src/services/metricas.py
+
+import os
+import re
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.services.instrumentacao import AGREGADOR_GLOBAL, BALDES_MS
+
+# Prefixo de todas as métricas expostas
+PREFIXO = "alpr"
+
+# Contadores do Perfil com família própria: prefixo do contador -> (métrica, rótulo, ajuda)
+FAMILIAS_CONTADORES = [
+    ("candidatos_", "candidatos_total", "tipo", "Candidatos a placa por etapa da detecção (gerados, pontuados...)."),
+    ("vencedor_rank_", "vencedor_rank_total", "rank", "Posição no ranking do candidato cuja leitura foi aceita."),
+    ("vencedor_ocr_", "vencedor_ocr_total", "modo", "Modo do OCR (lote/completo) da leitura aceita."),
+    ("cache_acertos_", "cache_resultados_acertos_total", "camada", "Imagens atendidas pelo cache de resultados."),
+]
+CONTADORES_SIMPLES = {
+    "chamadas_ocr": ("ocr_chamadas_total", "Chamadas ao OCR (um lote conta como uma chamada)."),
+    "validacao_rejeicoes": ("validacao_rejeicoes_total", "Leituras do OCR rejeitadas pela Validacao."),
+    "cache_falhas": ("cache_resultados_falhas_total", "Imagens que não estavam no cache de resultados."),
+    "sem_candidatos": ("sem_candidatos_total", "Imagens sem nenhum candidato a placa."),
+    "sem_placa_valida": ("sem_placa_valida_total", "Imagens em que nenhum candidato gerou placa válida."),
+}
+
+
+def estatisticasProcesso() -> dict:
+    """
+    Estado do processo atual que não passa pelo Perfil: fila/latência do EscritorPersistencia
+    (só se ele já existir: ler métricas não cria a thread de escrita) e memória do OCR.
+    Os workers do servidor HTTP publicam isto periodicamente (ver PoolInferencia).
+    """
+    from src.services.persistencia import EscritorPersistencia
+    from src.services.ocr import MemoOCR
+    escritor = EscritorPersistencia._instancia
+    return {
+        "pid": os.getpid(),
+        "persistencia": {**escritor.estatisticas, "lote_histograma": list(escritor.estatisticas["lote_histograma"]),
+                         "fila": escritor.profundidade()} if escritor else None,
+        "memo_ocr": dict(MemoOCR.estatisticas),
+    }
+
+
+class Metricas:
+    """
+    Exposição das métricas do pipeline no formato texto do Prometheus (version=0.0.4),
+    a partir do AgregadorPerfis (latência por etapa vira histograma, contadores do Perfil
+    viram counters) e do estado dos processos (fila e latência de escrita no banco, memória
+    do OCR). Nada é medido aqui: só formata o que já é registrado.
+    """
+
+    TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        # nome -> (tipo, ajuda, linhas): as amostras de uma família precisam sair juntas no texto
+        self._familias = {}
+
+    @staticmethod
+    def _rotulos(rotulos: dict) -> str:
+        if not rotulos: return ""
+        escapar = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in rotulos.items()) + "}"
+
+    @staticmethod
+    def _valor(valor) -> str:
+        """ Inteiros exatos (contadores passam de 1e6 sem virar notação científica); floats com precisão total. """
+        valor = float(valor)
+        if math.isnan(valor): return "NaN"
+        if math.isinf(valor): return "+Inf" if valor > 0 else "-Inf"
+        return str(int(valor)) if valor.is_integer() else repr(valor)
+
+    def _familia(self, nome, tipo, ajuda):
+        return self._familias.setdefault(nome, (tipo, ajuda, []))[2]
+
+    def amostra(self, nome, tipo, ajuda, valor, rotulos=None):
+        self._familia(nome, tipo, ajuda).append(f"{PREFIXO}_{nome}{self._rotulos(rotulos)} {self._valor(valor)}")
+
+    def histograma(self, nome, ajuda, limites, contagens, soma, rotulos=None):
+        """ `contagens` por balde (NÃO acumuladas, com o balde +Inf no fim), como no AgregadorPerfis. """
+        linhas = self._familia(nome, "histogram", ajuda)
+        rotulos = rotulos or {}
+        acumulado = 0
+        for limite, n in zip(list(limites) + ["+Inf"], contagens):
+            acumulado += n
+            le = limite if limite == "+Inf" else f"{limite:g}"
+            linhas.append(f"{PREFIXO}_{nome}_bucket{self._rotulos({**rotulos, 'le': le})} {acumulado}")
+        linhas.append(f"{PREFIXO}_{nome}_sum{self._rotulos(rotulos)} {self._valor(soma)}")
+        linhas.append(f"{PREFIXO}_{nome}_count{self._rotulos(rotulos)} {acumulado}")
+
+    def adicionarAgregador(self, agregador=AGREGADOR_GLOBAL):
+        resumo = agregador.resumo()
+        limites_s = [b / 1000.0 for b in agregador.baldes_ms]
+        self.amostra("imagens_processadas_total", "counter", "Perfis registrados (imagens/frames processados).",
+                     resumo["requisicoes"])
+        for etapa, e in sorted(resumo["etapas"].items()):
+            self.histograma("etapa_duracao_segundos", "Tempo de parede por etapa do pipeline, por imagem.",
+                            limites_s, e["histograma"], e["total_ms"] / 1000.0, {"etapa": etapa})
+            self.amostra("etapa_chamadas_total", "counter", "Execuções de cada etapa (uma imagem pode ter várias).",
+                         e["chamadas"], {"etapa": etapa})
+
+        for nome, valor in sorted(resumo["contadores"].items()):
+            if nome in CONTADORES_SIMPLES:
+                metrica, ajuda = CONTADORES_SIMPLES[nome]
+                self.amostra(metrica, "counter", ajuda, valor)
+                continue
+            for prefixo, metrica, rotulo, ajuda in FAMILIAS_CONTADORES:
+                if nome.startswith(prefixo):
+                    self.amostra(metrica, "counter", ajuda, valor, {rotulo: nome[len(prefixo):]})
+                    break
+            else:
+                self.amostra("eventos_total", "counter", "Demais contadores do Perfil.", valor,
+                             {"nome": re.sub(r"[^a-zA-Z0-9_]", "_", nome)})
+        return self
+
+    def adicionarProcessos(self, estatisticas: list):
+        """ `estatisticas`: dicts de estatisticasProcesso(), um por processo (rótulo "pid"). """
+        for est in estatisticas:
+            pid = {"pid": est["pid"]}
+            persistencia = est.get("persistencia")
+            if persistencia:
+                self.amostra("persistencia_fila", "gauge", "Registros aguardando gravação no banco.",
+                             persistencia["fila"], pid)
+                self.histograma("persistencia_lote_duracao_segundos",
+                                "Duração de cada gravação em lote (codificação dos registros + commit) no banco.",
+                                [b / 1000.0 for b in BALDES_MS], persistencia["lote_histograma"],
+                                persistencia["lote_soma_ms"] / 1000.0, pid)
+                self.amostra("persistencia_registros_total", "counter", "Registros gravados no banco.",
+                             persistencia["registros"], pid)
+                self.amostra("persistencia_lotes_total", "counter", "Commits em lote no banco.",
+                             persistencia["lotes"], pid)
+                self.amostra("persistencia_erros_total", "counter", "Registros que falharam ao gravar.",
+                             persistencia["erros"], pid)
+            for resultado, valor in est.get("memo_ocr", {}).items():
+                self.amostra("memo_ocr_consultas_total", "counter", "Consultas à memória de leituras do OCR.",
+                             valor, {**pid, "resultado": resultado})
+        return self
+
+    def texto(self) -> str:
+        linhas = []
+        for nome, (tipo, ajuda, amostras) in self._familias.items():
+            linhas += [f"# HELP {PREFIXO}_{nome} {ajuda}", f"# TYPE {PREFIXO}_{nome} {tipo}", *amostras]
+        return "\n".join(linhas) + "\n"
+
+    @staticmethod
+    def exportar(agregador=AGREGADOR_GLOBAL, processos: list = None) -> str:
+        """ Texto completo das métricas; sem `processos`, usa o estado do processo atual. """
+        return Metricas().adicionarAgregador(agregador) \
+            .adicionarProcessos(processos if processos is not None else [estatisticasProcesso()]).texto()
+
+
+def servirMetricas(porta: int, host: str = "127.0.0.1"):
+    """
+    Sobe, numa thread daemon, um endpoint GET /metrics com Metricas.exportar() do processo atual
+    (para quem não usa o servidor HTTP, ex.: processar_video.py). Retorna o servidor.
+    """
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            corpo = Metricas.exportar().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", Metricas.TIPO_CONTEUDO)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *_):
+            pass  # sem uma linha no terminal a cada coleta
+
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    threading.Thread(target=servidor.serve_forever, name="Metricas", daemon=True).start()
+    print(f"[INFO] Métricas em http://{host}:{porta}/metrics")
+    return servidor
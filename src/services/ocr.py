@@ -1,17 +1,296 @@
 # src/services/ocr.py
 
+import os
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import cv2
 from paddleocr import PaddleOCR
 import numpy as np
+from src.services.montagem import Montagem
+from src.services.validacao import Validacao
 # import logging # REMOVIDO
 # import sys     # REMOVIDO
-# import os      # REMOVIDO
 # import contextlib # REMOVIDO
 
 # --- REMOVIDO: Configuração de logging e função suppress_stderr ---
 
+# Tamanho padrão do pool (quantos leitores PaddleOCR podem existir no processo).
+# Pode ser ajustado pela variável de ambiente OCR_POOL_TAMANHO ou por PoolOCR.configurar().
+TAMANHO_POOL_PADRAO = int(os.environ.get("OCR_POOL_TAMANHO", "1"))
+
+# Memória de leituras (MemoOCR): quantos recortes guardar e a tolerância de similaridade
+# (0 = só recortes idênticos). Ver MemoOCR.distancia() para a escala da tolerância.
+TAMANHO_MEMO_PADRAO = int(os.environ.get("OCR_MEMO_TAMANHO", "512"))
+TOLERANCIA_MEMO_PADRAO = float(os.environ.get("OCR_MEMO_TOLERANCIA", "0.35"))
+
+
+class PoolOCR:
+    """
+    Pool de leitores PaddleOCR compartilhado por todo o processo.
+    Os modelos são carregados uma única vez; cada chamador pega um leitor
+    emprestado (uso exclusivo enquanto durar o empréstimo) e o devolve ao final.
+    O número de leitores é limitado: se todos estiverem em uso, o chamador espera.
+    """
+    _tamanho = max(1, TAMANHO_POOL_PADRAO)
+    # rec_batch_num: quantos recortes o reconhecedor processa por inferência (ver OCR.executarLote)
+    _parametros = {"use_angle_cls": False, "lang": "en", "show_log": False, "rec_batch_num": 8}
+    _livres = queue.LifoQueue()
+    _criados = 0
+    _geracao = 0  # muda a cada reconfiguração; leitores antigos são descartados na devolução
+    _lock = threading.Lock()
+
+    @classmethod
+    def configurar(cls, tamanho: int = None, **parametros_paddle):
+        """
+        Ajusta o tamanho máximo do pool e/ou os parâmetros do PaddleOCR.
+        Se os parâmetros mudarem, os leitores atuais são descartados e recriados sob demanda.
+        """
+        with cls._lock:
+            if tamanho is not None:
+                cls._tamanho = max(1, int(tamanho))
+            novos = {**cls._parametros, **parametros_paddle}
+            if novos != cls._parametros:
+                cls._parametros = novos
+                cls._geracao += 1
+                cls._criados = 0
+                cls._livres = queue.LifoQueue()
+
+    @classmethod
+    def _obter(cls, timeout: float = None):
+        # 1. Reaproveita um leitor livre, se houver
+        try:
+            return cls._livres.get_nowait()
+        except queue.Empty:
+            pass
+
+        # 2. Ainda há espaço no pool: reserva a vaga e cria o leitor fora do lock
+        with cls._lock:
+            pode_criar = cls._criados < cls._tamanho
+            if pode_criar:
+                cls._criados += 1
+            geracao, parametros, livres = cls._geracao, dict(cls._parametros), cls._livres
+        if pode_criar:
+            try:
+                return (geracao, PaddleOCR(**parametros))
+            except Exception:
+                with cls._lock:
+                    if geracao == cls._geracao:
+                        cls._criados -= 1
+                raise
+
+        # 3. Pool cheio: espera algum leitor ser devolvido
+        return livres.get(timeout=timeout)
+
+    @classmethod
+    def _devolver(cls, item):
+        geracao, _ = item
+        with cls._lock:
+            if geracao != cls._geracao:
+                return  # leitor de uma configuração antiga, descarta
+            livres = cls._livres
+        livres.put(item)
+
+    @classmethod
+    @contextmanager
+    def emprestar(cls, timeout: float = None):
+        """
+        Empresta um leitor PaddleOCR do pool (uso: `with PoolOCR.emprestar() as reader:`).
+        Levanta queue.Empty se `timeout` expirar sem leitor disponível.
+        """
+        item = cls._obter(timeout)
+        try:
+            yield item[1]
+        finally:
+            cls._devolver(item)
+
+    @classmethod
+    def aquecer(cls, quantidade: int = None) -> int:
+        """
+        Carrega antecipadamente até `quantidade` leitores (padrão: tamanho do pool)
+        e executa uma inferência de teste em cada um, para que a primeira
+        requisição real não pague o custo de inicialização dos modelos.
+        Retorna quantos leitores existem no pool ao final.
+        """
+        alvo = min(cls._tamanho, quantidade or cls._tamanho)
+        imagem_teste = np.full((130, 400, 3), 255, dtype=np.uint8)
+        emprestados = []
+        try:
+            while cls._criados < alvo:
+                item = cls._obter()
+                emprestados.append(item)
+                item[1].ocr(imagem_teste)
+        except Exception as e:
+            print(f"ERRO ao aquecer o pool do PaddleOCR: {e}")
+        finally:
+            for item in emprestados:
+                cls._devolver(item)
+        return cls._criados
+
+
+class MemoOCR:
+    """
+    Memória (LRU) das leituras do OCR por recorte, para não reconhecer de novo recortes
+    praticamente iguais (candidatos vizinhos da mesma placa, a mesma placa em frames seguidos).
+
+    Cada recorte vira uma assinatura:
+      - chave exata: hash dos pixels (recortes idênticos = acerto imediato);
+      - miniatura 128x40 em cinza, suavizada e normalizada (média 0, desvio 1: ignora brilho/contraste);
+      - versão grossa 16x5 da miniatura, para pré-selecionar candidatos com uma conta vetorizada.
+    Sem acerto exato, as entradas mais próximas pela versão grossa são comparadas pela
+    distancia() (alinhada por correlação de fase); abaixo da tolerância, a leitura é reaproveitada.
+    As leituras ficam separadas por modo ("rec"/"completo") e por geração do PoolOCR.
+    """
+    _LARGURA, _ALTURA = 128, 40
+    _GROSSA = (16, 5)
+    _VERIFICAR = 3  # quantas entradas mais próximas (pela versão grossa) passam pela comparação fina
+    _tamanho = max(0, TAMANHO_MEMO_PADRAO)
+    _tolerancia = max(0.0, TOLERANCIA_MEMO_PADRAO)
+    _entradas = OrderedDict()  # chave exata -> (modo, geracao, miniatura, grossa, (texto, confiancas))
+    _lock = threading.Lock()
+    estatisticas = {"acertos_exatos": 0, "acertos_similares": 0, "falhas": 0}
+
+    @classmethod
+    def configurar(cls, tamanho: int = None, tolerancia: float = None):
+        """ Ajusta capacidade (0 desliga a memória) e tolerância; esvazia a memória. """
+        with cls._lock:
+            if tamanho is not None: cls._tamanho = max(0, int(tamanho))
+            if tolerancia is not None: cls._tolerancia = max(0.0, float(tolerancia))
+            cls._entradas.clear()
+
+    @classmethod
+    def limpar(cls):
+        with cls._lock:
+            cls._entradas.clear()
+
+    @classmethod
+    def assinatura(cls, imagem):
+        chave = hashlib.blake2b(np.ascontiguousarray(imagem).data, digest_size=16).hexdigest() + str(imagem.shape)
+        gray = cv2.cvtColor(imagem, cv2.COLOR_BGR2GRAY) if imagem.ndim == 3 else imagem
+        mini = cv2.resize(gray, (cls._LARGURA, cls._ALTURA), interpolation=cv2.INTER_AREA).astype(np.float32)
+        mini = cv2.GaussianBlur(mini, (0, 0), 1.5)
+        mini -= mini.mean()
+        mini /= mini.std() + 1e-6
+        grossa = cv2.resize(mini, cls._GROSSA, interpolation=cv2.INTER_AREA).ravel()
+        return chave, mini, grossa
+
+    @classmethod
+    def distancia(cls, mini_a, mini_b) -> float:
+        """
+        Maior diferença média local (janelas 5x5) entre as miniaturas, depois de alinhar A sobre B
+        pela correlação de fase. Na escala usada: ruído/compressão ~0.02, mesma placa deslocada
+        alguns pixels 0.1–0.5, um caractere diferente >= 0.7.
+        """
+        (dx, dy), _ = cv2.phaseCorrelate(mini_a, mini_b)
+        alinhada = cv2.warpAffine(mini_a, np.float32([[1, 0, dx], [0, 1, dy]]), (cls._LARGURA, cls._ALTURA),
+                                  borderMode=cv2.BORDER_REPLICATE)
+        m = int(np.ceil(max(abs(dx), abs(dy)))) + 1  # ignora a borda que o deslocamento inventou
+        if 2 * m >= cls._ALTURA: return float("inf")
+        diferenca = cv2.blur(np.abs(alinhada - mini_b), (5, 5))[m:-m, m:-m]
+        return float(diferenca.max())
+
+    @classmethod
+    def buscar(cls, modo: str, assinatura):
+        """ Retorna (texto, confiancas) memorizado para um recorte equivalente, ou None. """
+        if cls._tamanho <= 0: return None
+        chave, mini, grossa = assinatura
+        geracao = PoolOCR._geracao
+        with cls._lock:
+            entrada = cls._entradas.get(chave)
+            if entrada is not None and entrada[0] == modo and entrada[1] == geracao:
+                cls._entradas.move_to_end(chave)
+                cls.estatisticas["acertos_exatos"] += 1
+                return entrada[4]
+            candidatas = [(k, e) for k, e in cls._entradas.items() if e[0] == modo and e[1] == geracao] \
+                if cls._tolerancia > 0 else []
+        if candidatas:
+            distancias_grossas = np.abs(np.stack([e[3] for _, e in candidatas]) - grossa).mean(axis=1)
+            for i in np.argsort(distancias_grossas)[:cls._VERIFICAR]:
+                k, e = candidatas[i]
+                if cls.distancia(e[2], mini) <= cls._tolerancia:
+                    with cls._lock:
+                        if k in cls._entradas: cls._entradas.move_to_end(k)
+                        cls.estatisticas["acertos_similares"] += 1
+                    return e[4]
+        with cls._lock:
+            cls.estatisticas["falhas"] += 1
+        return None
+
+    @classmethod
+    def guardar(cls, modo: str, assinatura, resultado):
+        if cls._tamanho <= 0: return
+        chave, mini, grossa = assinatura
+        with cls._lock:
+            cls._entradas[chave] = (modo, PoolOCR._geracao, mini, grossa, resultado)
+            cls._entradas.move_to_end(chave)
+            while len(cls._entradas) > cls._tamanho:
+                cls._entradas.popitem(last=False)
+
+
+class DecodificadorCTC:
+    """
+    Envolve o pós-processamento (CTCLabelDecode) do reconhecedor do PaddleOCR para devolver,
+    além do texto e da confiança média, a probabilidade de CADA caractere: o máximo da saída
+    do modelo no passo de tempo que gerou o caractere (os mesmos passos que o decode mantém:
+    sem o token "branco" e sem repetições consecutivas).
+    Só age com `por_caractere` ligado (OCR.executarLote liga enquanto tem o leitor emprestado);
+    fora disso devolve exatamente o resultado original, e o ocr() completo não é afetado.
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self.por_caractere = False
+
+    def __getattr__(self, nome):
+        return getattr(self.original, nome)
+
+    @staticmethod
+    def instalar(reader):
+        reconhecedor = reader.text_recognizer
+        if not isinstance(reconhecedor.postprocess_op, DecodificadorCTC):
+            reconhecedor.postprocess_op = DecodificadorCTC(reconhecedor.postprocess_op)
+        return reconhecedor.postprocess_op
+
+    def _probabilidades(self, preds):
+        """ Lista de probabilidades por caractere de cada linha do lote, ou None se não for CTC. """
+        if not hasattr(self.original, "get_ignored_tokens"):
+            return None
+        if isinstance(preds, (tuple, list)): preds = preds[-1]
+        if hasattr(preds, "numpy"): preds = preds.numpy()
+        preds = np.asarray(preds)
+        if preds.ndim != 3:
+            return None
+        indices, probabilidades = preds.argmax(axis=2), preds.max(axis=2)
+        ignorados = self.original.get_ignored_tokens()
+        linhas = []
+        for indices_linha, prob_linha in zip(indices, probabilidades):
+            manter = np.ones(len(indices_linha), dtype=bool)
+            manter[1:] = indices_linha[1:] != indices_linha[:-1]
+            for token in ignorados:
+                manter &= indices_linha != token
+            linhas.append([float(p) for p in prob_linha[manter]])
+        return linhas
+
+    def __call__(self, preds, *args, **kwargs):
+        resultado = self.original(preds, *args, **kwargs)
+        if not self.por_caractere:
+            return resultado
+        linhas = self._probabilidades(preds)
+        if linhas is None or len(linhas) != len(resultado):
+            linhas = [None] * len(resultado)
+        return [(texto, conf, probs) for (texto, conf, *_), probs in zip(resultado, linhas)]
+
+
 class OCR:
 
+    @staticmethod
+    def aquecer(quantidade: int = None) -> int:
+        """ Atalho para PoolOCR.aquecer(): pré-carrega os modelos do OCR no processo. """
+        return PoolOCR.aquecer(quantidade)
+
     @staticmethod
     def _parse_resultado(resultado):
         """
@@ -35,30 +314,100 @@ class OCR:
         return (texto_final, confiancas)
 
     @staticmethod
-    def executarImg(imagem):
+    def executarImg(imagem, modo: str = "rec"):
         """
         Realiza OCR na imagem inteira da placa.
-        Cria uma nova instância do leitor a cada chamada para garantir estabilidade.
+        O leitor é emprestado do PoolOCR (modelos carregados uma única vez por processo).
+
+        Modos:
+          - "rec": só o reconhecedor (o recorte já é a placa retificada, então a detecção
+                   de texto é dispensável). Se a leitura não passar na Validacao, repete
+                   automaticamente com o OCR completo.
+          - "completo": detecção de texto + reconhecimento (comportamento original).
         """
-        reader = None
+        if modo == "rec":
+            texto, confiancas = OCR.executarLote([imagem])[0]
+            if Validacao.executar(Montagem.executar(texto), confiancas):
+                return (texto, confiancas)
+            # Leitura rec-only inválida: cai no OCR completo
+
+        assinatura = None
+        if imagem is not None and imagem.size > 0:
+            assinatura = MemoOCR.assinatura(imagem)
+            memorizado = MemoOCR.buscar("completo", assinatura)
+            if memorizado is not None:
+                return (memorizado[0], list(memorizado[1]))
+
         try:
-            # A instância é criada aqui, sem supressão de stderr
-            reader = PaddleOCR(use_angle_cls=False, lang='en', show_log=False)
+            with PoolOCR.emprestar() as reader:
+                resultado = reader.ocr(imagem)
         except Exception as e:
-            # import sys # Descomente se sys não estiver importado globalmente
-            # print(f"ERRO ao inicializar PaddleOCR: {e}", file=sys.stderr)
-            print(f"ERRO ao inicializar PaddleOCR: {e}") # Imprime no stdout padrão
+            print(f"ERRO durante a execução do OCR: {e}") # Imprime no stdout padrão
             return "", []
 
-        if reader is None:
-             return "", []
+        texto, confiancas = OCR._parse_resultado(resultado)
+        leitura = (texto.strip().upper(), confiancas)
+        if assinatura is not None: MemoOCR.guardar("completo", assinatura, (leitura[0], list(leitura[1])))
+        return leitura
+
+    @staticmethod
+    def executarLote(imagens):
+        """
+        Reconhece vários recortes de placa numa única chamada ao reconhecedor do PaddleOCR
+        (os recortes viram um lote com padding, sem a etapa de detecção de texto).
+        Retorna uma lista de (texto, confiancas) na mesma ordem de `imagens`, com uma confiança
+        por caractere do texto (probabilidade do CTC no passo que gerou o caractere, ver
+        DecodificadorCTC); recortes vazios/inválidos resultam em ("", []).
+        Recortes equivalentes a um já lido (MemoOCR), ou a outro do mesmo lote, não vão ao reconhecedor.
+        """
+        resultados = [("", []) for _ in imagens]
+        indices, lote, assinaturas = [], [], []
+        repetidos = {}  # índice do recorte -> posição no lote do recorte equivalente
+        for i, img in enumerate(imagens):
+            if img is None or img.size == 0: continue
+            if img.ndim == 2: img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+            assinatura = MemoOCR.assinatura(img)
+            memorizado = MemoOCR.buscar("rec", assinatura)
+            if memorizado is not None:
+                resultados[i] = (memorizado[0], list(memorizado[1]))
+                continue
+            # Candidatos vizinhos costumam gerar recortes quase iguais dentro do mesmo lote
+            for j, anterior in enumerate(assinaturas):
+                if anterior[0] == assinatura[0] or (MemoOCR._tolerancia > 0 and
+                        MemoOCR.distancia(anterior[1], assinatura[1]) <= MemoOCR._tolerancia):
+                    repetidos[i] = j
+                    break
+            else:
+                indices.append(i)
+                lote.append(img)
+                assinaturas.append(assinatura)
+        if not lote:
+            return resultados
 
         try:
-            resultado = reader.ocr(imagem)
-            texto, confiancas = OCR._parse_resultado(resultado)
-            return (texto.strip().upper(), confiancas)
+            with PoolOCR.emprestar() as reader:
+                decodificador = DecodificadorCTC.instalar(reader)
+                decodificador.por_caractere = True
+                try:
+                    rec_res, _ = reader.text_recognizer(lote)
+                finally:
+                    decodificador.por_caractere = False
         except Exception as e:
-             # import sys # Descomente se sys não estiver importado globalmente
-             # print(f"ERRO durante a execução do OCR: {e}", file=sys.stderr)
-             print(f"ERRO durante a execução do OCR: {e}") # Imprime no stdout padrão
-             return "", []
\ No newline at end of file
+            print(f"ERRO durante a execução do OCR em lote: {e}")
+            return resultados
+
+        for i, assinatura, (texto, conf, *extra) in zip(indices, assinaturas, rec_res):
+            if not isinstance(conf, (int, float)): conf = 0.0
+            probabilidades = extra[0] if extra else None
+            if probabilidades is None or len(probabilidades) != len(texto):
+                # Decodificador sem saída por passo (não CTC): a confiança da linha vale para todos
+                probabilidades = [float(conf)] * len(texto)
+            # strip() alinhado: descarta as probabilidades dos espaços das pontas
+            inicio, fim = len(texto) - len(texto.lstrip()), len(texto.rstrip())
+            texto = texto[inicio:fim].upper()
+            resultados[i] = (texto, probabilidades[inicio:fim] if fim > inicio else [])
+            MemoOCR.guardar("rec", assinatura, (texto, list(resultados[i][1])))
+        for i, j in repetidos.items():
+            texto, confiancas = resultados[indices[j]]
+            resultados[i] = (texto, list(confiancas))
+        return resultados
@@ -1,41 +1,233 @@
+import os
 import cv2
+import time
+import queue
+import atexit
+import bisect
+import threading
 from datetime import datetime
 
 from src.config.db import SessionLocal
 from src.models.acessoModel import TabelaAcesso
+from src.services.armazenamentoImagens import ArmazenamentoImagens
+from src.services.instrumentacao import BALDES_MS
+
+# Configuração da escrita em segundo plano (pode ser ajustada por variáveis de ambiente):
+# - FILA_MAX: quantos registros podem aguardar gravação (fila cheia = back-pressure no chamador)
+# - LOTE_MAX: quantos registros no máximo por commit
+# - LOTE_MS: tempo máximo que um registro espera até o commit do seu lote
+FILA_MAX_PADRAO = int(os.environ.get("PERSISTENCIA_FILA_MAX", "256"))
+LOTE_MAX_PADRAO = int(os.environ.get("PERSISTENCIA_LOTE_MAX", "50"))
+LOTE_MS_PADRAO = int(os.environ.get("PERSISTENCIA_LOTE_MS", "200"))
+# PERSISTENCIA_ASSINCRONA=0 faz o controller voltar a gravar de forma síncrona
+PERSISTENCIA_ASSINCRONA = os.environ.get("PERSISTENCIA_ASSINCRONA", "1") != "0"
+# Quanto o controller espera por vaga na fila cheia antes de descartar o registro (segundos)
+TIMEOUT_ENFILEIRAR_PADRAO = float(os.environ.get("PERSISTENCIA_TIMEOUT_S", "5"))
+
 # --- CORREÇÃO APLICADA AQUI ---
 class Persistencia:
+    @staticmethod
+    def _montarRegistro(placa, score, img_source, img_crop, img_annot, data_captura = None):
+        """
+        Codifica as imagens em JPEG, grava-as no ArmazenamentoImagens (arquivos nomeados
+        pelo hash do conteúdo) e monta o objeto ORM só com os hashes (sem tocar no banco).
+        Retorna (registro, arquivos); `arquivos` vai para _confirmarArquivos depois do commit.
+        """
+        # converter imagens OpenCV (numpy) em bytes
+        _, buf_source = cv2.imencode(".jpg", img_source)
+        _, buf_annot  = cv2.imencode(".jpg", img_annot)
+        # --- CORREÇÃO APLICADA AQUI ---
+        # A imagem 'img_crop' está em RGB, então a convertemos de volta para BGR
+        # antes de salvá-la com a função do OpenCV.
+        img_crop_bgr = cv2.cvtColor(img_crop, cv2.COLOR_RGB2BGR)
+        _, buf_crop = cv2.imencode(".jpg", img_crop_bgr)
+        arquivos = [("source", buf_source.tobytes()), ("crop", buf_crop.tobytes()),
+                    ("annotated", buf_annot.tobytes())]
+        hashes = {tipo: ArmazenamentoImagens.salvar(tipo, dados) for tipo, dados in arquivos}
+        # aqui cria o objeto do modelo ORM com os dados para salvar no banco
+        registro = TabelaAcesso(
+            plate_text=placa,
+            confidence=score,
+            source_hash=hashes["source"],
+            crop_hash=hashes["crop"],
+            annotated_hash=hashes["annotated"],
+            created_at=data_captura or datetime.utcnow()
+        )
+        return registro, arquivos
+
+    @staticmethod
+    def _confirmarArquivos(arquivos):
+        """
+        Chamado depois do commit: um excluirRegistro concorrente pode ter apagado um arquivo
+        compartilhado (mesmo hash) antes de este registro existir no banco. Agora que o registro
+        está commitado nenhuma exclusão o apaga mais, então basta regravar o que faltar.
+        """
+        for tipo, dados in arquivos:
+            ArmazenamentoImagens.salvar(tipo, dados)
+
     @staticmethod
     def salvar(placa, score, img_source, img_crop, img_annot, data_captura = None):
         if not placa:
             print("[WARN] Placa inválida, não será salva.")
             return
 
+        db = None
         try:
             db = SessionLocal()
-
-            # converter imagens OpenCV (numpy) em bytes
-            _, buf_source = cv2.imencode(".jpg", img_source)
-            _, buf_annot  = cv2.imencode(".jpg", img_annot)
-            # --- CORREÇÃO APLICADA AQUI ---
-            # A imagem 'img_crop' está em RGB, então a convertemos de volta para BGR
-            # antes de salvá-la com a função do OpenCV.
-            img_crop_bgr = cv2.cvtColor(img_crop, cv2.COLOR_RGB2BGR)
-            _, buf_crop = cv2.imencode(".jpg", img_crop_bgr)
-            # aqui cria o objeto do modelo ORM com os dados para salvar no banco 
-            novo_registro = TabelaAcesso(
-                plate_text=placa,
-                confidence=score,
-                source_image=buf_source.tobytes(),
-                plate_crop_image=buf_crop.tobytes(),
-                annotated_image=buf_annot.tobytes(),
-                created_at=data_captura or datetime.utcnow()
-            )
-
+            novo_registro, arquivos = Persistencia._montarRegistro(placa, score, img_source, img_crop, img_annot,
+                                                                   data_captura)
             db.add(novo_registro)
             db.commit()
+            Persistencia._confirmarArquivos(arquivos)
             print(f"[INFO] Placa '{placa}' salva no banco com sucesso.")
         except Exception as e:
             print(f"[ERRO] Erro ao salvar no banco: {e}")
         finally:
-            db.close()
\ No newline at end of file
+            if db is not None: db.close()
+
+    @staticmethod
+    def salvarAssincrono(placa, score, img_source, img_crop, img_annot, data_captura = None, timeout: float = None) -> bool:
+        """
+        Enfileira o registro para o EscritorPersistencia (codificação JPEG + commit em lote
+        numa thread dedicada) e retorna sem esperar o disco.
+        Se a fila estiver cheia, bloqueia até `timeout` segundos (None = espera o quanto for preciso).
+        Retorna False se o registro não pôde ser enfileirado.
+        As imagens são codificadas depois, na thread de escrita: o chamador não deve alterá-las.
+        """
+        if not placa:
+            print("[WARN] Placa inválida, não será salva.")
+            return False
+        return EscritorPersistencia.instancia().enfileirar(
+            (placa, score, img_source, img_crop, img_annot, data_captura), timeout=timeout)
+
+
+class EscritorPersistencia:
+    """
+    Fila de escrita em segundo plano (write-behind) para a tabela de acessos.
+    - Fila limitada: quando cheia, quem enfileira espera (back-pressure).
+    - Uma thread dedicada codifica as imagens e grava em lotes: commit a cada `lote_max`
+      registros ou quando o registro mais antigo do lote espera `lote_ms` milissegundos.
+    - No encerramento do processo (atexit) a fila é esvaziada antes de sair.
+    """
+    _instancia = None
+    _lock_instancia = threading.Lock()
+    _FIM = object()
+
+    def __init__(self, fila_max=FILA_MAX_PADRAO, lote_max=LOTE_MAX_PADRAO, lote_ms=LOTE_MS_PADRAO):
+        self.fila = queue.Queue(maxsize=max(1, fila_max))
+        self.lote_max = max(1, lote_max)
+        self.lote_s = max(0, lote_ms) / 1000.0
+        # lote_histograma: duração de cada gravação em lote, nos baldes de BALDES_MS (o último é "acima de tudo")
+        self.estatisticas = {"registros": 0, "lotes": 0, "erros": 0, "ultima_latencia_ms": 0.0,
+                             "lote_histograma": [0] * (len(BALDES_MS) + 1), "lote_soma_ms": 0.0}
+        self._encerrado = False
+        self._thread = threading.Thread(target=self._executar, name="EscritorPersistencia", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def instancia(cls):
+        """ Escritor compartilhado pelo processo (criado na primeira utilização). """
+        with cls._lock_instancia:
+            # Recria também se a thread de escrita morreu (senão a fila enche e ninguém mais grava)
+            if cls._instancia is None or cls._instancia._encerrado or not cls._instancia._thread.is_alive():
+                cls._instancia = cls()
+                atexit.register(cls._instancia.encerrar)
+            return cls._instancia
+
+    def profundidade(self) -> int:
+        """ Quantos registros aguardam gravação. """
+        return self.fila.qsize()
+
+    def enfileirar(self, item, timeout: float = None) -> bool:
+        if self._encerrado:
+            return False
+        try:
+            self.fila.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            print("[WARN] Fila de persistência cheia, registro descartado.")
+            return False
+
+    def esvaziar(self):
+        """ Bloqueia até todos os registros enfileirados até agora estarem gravados. """
+        self.fila.join()
+
+    def encerrar(self, timeout: float = 30.0):
+        """ Grava o que estiver na fila e para a thread de escrita. """
+        if self._encerrado:
+            return
+        self._encerrado = True
+        self.fila.put(self._FIM)
+        self._thread.join(timeout)
+
+    def _executar(self):
+        fim = False
+        while not fim:
+            item = self.fila.get()
+            if item is self._FIM:
+                self.fila.task_done()
+                break
+            lote = [item]
+            prazo = time.monotonic() + self.lote_s
+            # Junta mais registros até completar o lote ou estourar o prazo
+            while len(lote) < self.lote_max:
+                restante = prazo - time.monotonic()
+                try:
+                    item = self.fila.get(timeout=restante) if restante > 0 else self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._FIM:
+                    self.fila.task_done()
+                    fim = True
+                    break
+                lote.append(item)
+            try:
+                self._gravar(lote)
+            except Exception as e:
+                # Falha inesperada (ex.: abrir a sessão): conta o lote como perdido e segue gravando
+                self.estatisticas["erros"] += len(lote)
+                print(f"[ERRO] Falha ao gravar lote de {len(lote)} registros: {e}")
+            finally:
+                for _ in lote: self.fila.task_done()
+
+    def _gravar(self, lote):
+        inicio = time.perf_counter()
+        registros, arquivos = [], []
+        for dados in lote:
+            try:
+                registro, arquivos_registro = Persistencia._montarRegistro(*dados)
+                registros.append(registro)
+                arquivos.append(arquivos_registro)
+            except Exception as e:
+                self.estatisticas["erros"] += 1
+                print(f"[ERRO] Erro ao codificar imagens da placa '{dados[0]}': {e}")
+        if not registros:
+            return
+
+        db = SessionLocal()
+        try:
+            db.add_all(registros)
+            db.commit()
+            self.estatisticas["registros"] += len(registros)
+            for arquivos_registro in arquivos: Persistencia._confirmarArquivos(arquivos_registro)
+        except Exception as e:
+            db.rollback()
+            print(f"[ERRO] Erro ao salvar lote no banco ({len(registros)} registros), tentando um a um: {e}")
+            # Um registro ruim não deve derrubar o lote inteiro
+            for registro, arquivos_registro in zip(registros, arquivos):
+                try:
+                    db.add(registro)
+                    db.commit()
+                    self.estatisticas["registros"] += 1
+                    Persistencia._confirmarArquivos(arquivos_registro)
+                except Exception as e_reg:
+                    db.rollback()
+                    self.estatisticas["erros"] += 1
+                    print(f"[ERRO] Erro ao salvar placa '{registro.plate_text}': {e_reg}")
+        finally:
+            db.close()
+        duracao_ms = (time.perf_counter() - inicio) * 1000.0
+        self.estatisticas["lotes"] += 1
+        self.estatisticas["ultima_latencia_ms"] = duracao_ms
+        self.estatisticas["lote_histograma"][bisect.bisect_left(BALDES_MS, duracao_ms)] += 1
+        self.estatisticas["lote_soma_ms"] += duracao_ms
@@ -0,0 +1,220 @@
+# src/services/poolInferencia.py
+
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from multiprocessing import Pool, Value, cpu_count
+from multiprocessing.util import Finalize
+from datetime import datetime
+
+import cv2
+
+from src.services.instrumentacao import AGREGADOR_GLOBAL
+
+# Configuração padrão do pool (servidor HTTP):
+# - SERVIDOR_PROCESSOS: processos de inferência (cada um com seu PaddleOCR carregado)
+# - SERVIDOR_THREADS_POR_WORKER: threads internas de Paddle/OpenCV por processo
+# - SERVIDOR_FILA_MAX: imagens aceitas ao mesmo tempo (em processamento + esperando); acima disso, recusa
+# - SERVIDOR_TIMEOUT_S: quanto uma requisição espera pelo resultado de cada imagem
+PROCESSOS_PADRAO = int(os.environ.get("SERVIDOR_PROCESSOS", str(max(1, cpu_count() // 2))))
+THREADS_POR_WORKER_PADRAO = int(os.environ.get("SERVIDOR_THREADS_POR_WORKER", "1"))
+FILA_MAX_PADRAO = int(os.environ.get("SERVIDOR_FILA_MAX", "32"))
+TIMEOUT_PADRAO_S = float(os.environ.get("SERVIDOR_TIMEOUT_S", "30"))
+# De quanto em quanto tempo cada worker publica seu estado (fila de persistência, memória do OCR)
+INTERVALO_ESTATISTICAS_S = 1.0
+
+VARIAVEIS_THREADS = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]
+
+
+class FilaCheia(Exception):
+    """ O pool já tem `fila_max` imagens pendentes (o servidor responde 429). """
+
+
+# Erro da inicialização deste worker (None = inicializou); com erro, as tarefas são recusadas
+_FALHA_INICIALIZACAO = None
+
+
+def _publicarEstatisticas(publicacoes):
+    """ Thread do worker: publica o estado do processo mesmo quando ocioso (a fila de persistência anda sozinha). """
+    from src.services.metricas import estatisticasProcesso
+    while True:
+        time.sleep(INTERVALO_ESTATISTICAS_S)
+        try:
+            publicacoes.put_nowait(estatisticasProcesso())
+        except queue.Full:
+            pass  # o servidor não está consumindo: a próxima publicação substitui esta
+        except Exception:
+            return  # pool encerrado
+
+
+def _inicializarWorker(threads: int, prontos, falhas, publicacoes):
+    """
+    Roda uma vez em cada processo do pool: fixa as threads internas, carrega o Haar e o
+    PaddleOCR e faz uma inferência de aquecimento, para a primeira requisição não pagar isso.
+    Uma falha não escapa daqui (o Pool recriaria o worker para sempre): ela é contada em `falhas`,
+    publicada para o servidor (o /health passa a responder 503) e o worker recusa as tarefas.
+    """
+    global _FALHA_INICIALIZACAO
+    try:
+        # O pai já usou o banco (criarTabela) antes do fork: conexões sqlite3 herdadas não podem
+        # ser usadas aqui. dispose(close=False) esquece o pool herdado sem fechar as conexões do pai.
+        from src.config.db import engine
+        engine.dispose(close=False)
+        # O Paddle (e o OpenMP dele) só é importado abaixo, já no worker, então estas variáveis
+        # ainda valem para ele; numpy e OpenCV já vieram carregados do pai (daí o setNumThreads).
+        for nome in VARIAVEIS_THREADS:
+            os.environ[nome] = str(threads)
+        cv2.setNumThreads(threads)
+        from src.services.ocr import OCR, PoolOCR
+        from src.services.detectorHaar import DetectorHaar
+        from src.services.persistencia import EscritorPersistencia, PERSISTENCIA_ASSINCRONA
+        PoolOCR.configurar(tamanho=1, cpu_threads=threads)
+        DetectorHaar.carregar()
+        if OCR.aquecer(1) < 1:
+            # aquecer() só registra o erro: sem nenhum leitor criado o worker não tem OCR
+            raise RuntimeError("o PaddleOCR não pôde ser carregado")
+        if PERSISTENCIA_ASSINCRONA:
+            # Processos do pool não rodam o atexit: grava o que estiver na fila ao encerrar o pool
+            Finalize(None, EscritorPersistencia.instancia().encerrar, exitpriority=10)
+        threading.Thread(target=_publicarEstatisticas, args=(publicacoes,), name="Estatisticas", daemon=True).start()
+    except Exception as e:
+        _FALHA_INICIALIZACAO = f"{type(e).__name__}: {e}"
+        print(f"[ERRO] Worker {os.getpid()} não inicializou: {_FALHA_INICIALIZACAO}")
+        try:
+            publicacoes.put({"pid": os.getpid(), "falha_inicializacao": _FALHA_INICIALIZACAO}, timeout=5)
+        except queue.Full:
+            pass  # o contador `falhas` já basta para o /health
+        with falhas.get_lock():
+            falhas.value += 1
+        return
+    with prontos.get_lock():
+        prontos.value += 1
+
+
+def _reconhecer(dados: bytes, escala_deteccao: float, data_capturada: datetime):
+    """ Executado no worker: pipeline headless sobre os bytes de uma imagem, retorno serializável. """
+    if _FALHA_INICIALIZACAO is not None:
+        return {"status": "erro", "erro": f"worker não inicializado ({_FALHA_INICIALIZACAO})"}
+    from src.controllers.placaController import PlacaController
+    try:
+        resultado = PlacaController.processarImagem(dados, data_capturada, escala_deteccao=escala_deteccao,
+                                                    headless=True)
+    except Exception as e:
+        return {"status": "erro", "erro": str(e)}
+    quad = resultado.get("quad")
+    return {
+        "status": resultado["status"],
+        "placa": resultado.get("texto_final"),
+        "padrao": resultado.get("padrao"),
+        "quad": quad.tolist() if quad is not None else None,
+        "cache": resultado.get("cache"),
+        "perfil": resultado["perfil"],
+    }
+
+
+class PoolInferencia:
+    """
+    Pool de processos pré-aquecidos para o servidor HTTP. Controla quantas imagens estão
+    pendentes: `reconhecer` levanta FilaCheia em vez de enfileirar além de `fila_max`
+    (melhor o cliente tentar de novo do que esperar atrás de uma fila que não anda).
+    Seguro para chamar de várias threads (Flask com threaded=True).
+
+    Os perfis devolvidos pelos workers são somados ao AGREGADOR_GLOBAL deste processo. Cada
+    worker publica seu estado (fila e latência de persistência, memória do OCR) a cada
+    INTERVALO_ESTATISTICAS_S; o mais recente de cada um fica em `estatisticasWorkers()`,
+    para o endpoint de métricas. Workers que falharam ao inicializar ficam em `falhas_inicializacao`
+    (pid -> erro) e o pool deixa de ser `saudavel()`.
+    """
+
+    def __init__(self, processos: int = PROCESSOS_PADRAO, threads_por_worker: int = THREADS_POR_WORKER_PADRAO,
+                 fila_max: int = FILA_MAX_PADRAO):
+        self.processos = max(1, int(processos))
+        self.fila_max = max(1, int(fila_max))
+        self._pendentes = 0
+        self._lock = threading.Lock()
+        self.estatisticas = {"aceitas": 0, "recusadas": 0, "concluidas": 0, "erros": 0}
+        self._workers = {}  # pid -> estatisticasProcesso() mais recente
+        self.falhas_inicializacao = {}  # pid -> erro da inicialização
+        self._publicacoes = multiprocessing.Queue(maxsize=4 * self.processos)
+        threading.Thread(target=self._coletarEstatisticas, name="ColetaEstatisticas", daemon=True).start()
+
+        self._prontos, self._falhas = Value('i', 0), Value('i', 0)
+        inicio = time.time()
+        self._pool = Pool(processes=self.processos, initializer=_inicializarWorker,
+                          initargs=(threads_por_worker, self._prontos, self._falhas, self._publicacoes))
+        while self._prontos.value + self._falhas.value < self.processos:
+            time.sleep(0.05)
+        if self._falhas.value:
+            print(f"[ERRO] {self._falhas.value} de {self.processos} workers de inferência falharam ao inicializar.")
+        else:
+            print(f"[INFO] {self.processos} workers de inferência prontos ({threads_por_worker} thread(s) cada) "
+                  f"em {time.time() - inicio:.1f}s.")
+
+    def profundidade(self) -> int:
+        """ Imagens aceitas que ainda não terminaram (em processamento + esperando worker). """
+        return self._pendentes
+
+    def prontos(self) -> int:
+        """ Workers que terminaram a inicialização com sucesso. """
+        return self._prontos.value
+
+    def saudavel(self) -> bool:
+        return self._falhas.value == 0 and self._prontos.value == self.processos
+
+    def estatisticasWorkers(self):
+        with self._lock:
+            return list(self._workers.values())
+
+    def _coletarEstatisticas(self):
+        while True:
+            estatisticas = self._publicacoes.get()
+            if estatisticas is None: return
+            with self._lock:
+                if "falha_inicializacao" in estatisticas:
+                    self.falhas_inicializacao[estatisticas["pid"]] = estatisticas["falha_inicializacao"]
+                else:
+                    self._workers[estatisticas["pid"]] = estatisticas
+
+    def _liberar(self, resultado):
+        # Roda na thread de resultados do Pool, neste processo
+        falhou = isinstance(resultado, BaseException)
+        if not falhou and resultado.get("perfil"):
+            AGREGADOR_GLOBAL.registrar(resultado["perfil"])
+        with self._lock:
+            self._pendentes -= 1
+            self.estatisticas["erros" if falhou or resultado.get("status") == "erro" else "concluidas"] += 1
+
+    def reconhecer(self, imagens, escala_deteccao: float = 1.0, data_capturada: datetime = None,
+                   timeout: float = TIMEOUT_PADRAO_S):
+        """
+        `imagens`: lista de bytes (arquivos de imagem). Retorna um dict por imagem, na mesma ordem.
+        Levanta FilaCheia se as imagens não couberem na fila (nenhuma é aceita nesse caso).
+        """
+        with self._lock:
+            if self._pendentes + len(imagens) > self.fila_max:
+                self.estatisticas["recusadas"] += len(imagens)
+                raise FilaCheia(f"{self._pendentes} imagens pendentes (máximo {self.fila_max})")
+            self._pendentes += len(imagens)
+            self.estatisticas["aceitas"] += len(imagens)
+
+        data_capturada = data_capturada or datetime.now()
+        tarefas = [self._pool.apply_async(_reconhecer, (dados, escala_deteccao, data_capturada),
+                                          callback=self._liberar, error_callback=self._liberar)
+                   for dados in imagens]
+        limite = time.monotonic() + timeout
+        resultados = []
+        for tarefa in tarefas:
+            try:
+                resultados.append(tarefa.get(timeout=max(0.0, limite - time.monotonic())))
+            except multiprocessing.TimeoutError:
+                resultados.append({"status": "erro", "erro": "tempo esgotado"})
+            except Exception as e:
+                resultados.append({"status": "erro", "erro": str(e)})
+        return resultados
+
+    def encerrar(self):
+        self._pool.close()
+        self._pool.join()
+        self._publicacoes.put(None)
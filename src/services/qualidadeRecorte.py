@@ -0,0 +1,36 @@
+# src/services/qualidadeRecorte.py
+
+import cv2
+import numpy as np
+
+# Altura (px, no frame original) a partir da qual a placa é considerada "grande o bastante":
+# abaixo disso o recorte retificado (400x130) é uma ampliação e perde pontos proporcionalmente.
+ALTURA_REFERENCIA_PX = 40
+
+
+class QualidadeRecorte:
+    """
+    Nota barata de qualidade de um recorte de placa, para escolher em quais frames de um
+    vídeo vale a pena rodar o OCR: nitidez (variância do Laplaciano, que despenca com borrão
+    de movimento) ponderada pelo tamanho da placa no frame. Só serve para COMPARAR recortes
+    da mesma placa; o valor absoluto depende da iluminação e do contraste.
+    """
+
+    @staticmethod
+    def nitidez(crop_bgr) -> float:
+        """ Variância do Laplaciano do recorte em cinza. """
+        if crop_bgr is None or crop_bgr.size == 0: return 0.0
+        gray = cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2GRAY) if crop_bgr.ndim == 3 else crop_bgr
+        return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    @staticmethod
+    def fatorTamanho(quad) -> float:
+        """ Altura média do quad relativa a ALTURA_REFERENCIA_PX, saturada em 1. """
+        if quad is None: return 0.0
+        tl, tr, br, bl = np.asarray(quad, dtype=np.float32).reshape(4, 2)
+        altura = (np.linalg.norm(bl - tl) + np.linalg.norm(br - tr)) / 2.0
+        return float(min(1.0, altura / ALTURA_REFERENCIA_PX))
+
+    @staticmethod
+    def executar(crop_bgr, quad) -> float:
+        return QualidadeRecorte.nitidez(crop_bgr) * QualidadeRecorte.fatorTamanho(quad)
@@ -0,0 +1,195 @@
+# src/services/rastreamento.py
+
+import re
+import itertools
+
+import numpy as np
+
+from src.services.validacao import Validacao
+
+# Parâmetros padrão do rastreador:
+# - iou_minimo: sobreposição mínima (caixas alinhadas aos eixos) para um quad continuar uma trilha
+# - iou_duplicado: candidatos do MESMO frame mais sobrepostos que isso são a mesma placa (fica o de melhor rank)
+# - max_perdidos: frames processados seguidos sem a placa antes de a trilha ser encerrada
+# - max_ocr: leituras de OCR por trilha
+# - janela: frames observados por trilha antes de escolher o(s) melhor(es) recorte(s) para o OCR
+# - melhores: recortes guardados por janela; o OCR lê o melhor e só tenta o seguinte se a leitura for inválida
+# - ganho_qualidade: depois da primeira leitura válida, quanto uma nova janela precisa superar
+#   a qualidade do melhor recorte já lido para valer outro OCR
+CONFIG_RASTREAMENTO_PADRAO = {
+    "iou_minimo": 0.3,
+    "iou_duplicado": 0.5,
+    "max_perdidos": 5,
+    "max_ocr": 3,
+    "janela": 4,
+    "melhores": 2,
+    "ganho_qualidade": 1.25,
+}
+
+
+def _caixa(quad):
+    pts = np.asarray(quad, dtype=np.float32).reshape(-1, 2)
+    x0, y0 = pts.min(axis=0)
+    x1, y1 = pts.max(axis=0)
+    return float(x0), float(y0), float(x1), float(y1)
+
+
+def iou(caixa_a, caixa_b) -> float:
+    """ Intersecção sobre união de duas caixas (x0, y0, x1, y1). """
+    ix = max(0.0, min(caixa_a[2], caixa_b[2]) - max(caixa_a[0], caixa_b[0]))
+    iy = max(0.0, min(caixa_a[3], caixa_b[3]) - max(caixa_a[1], caixa_b[1]))
+    inter = ix * iy
+    if inter <= 0: return 0.0
+    area_a = (caixa_a[2] - caixa_a[0]) * (caixa_a[3] - caixa_a[1])
+    area_b = (caixa_b[2] - caixa_b[0]) * (caixa_b[3] - caixa_b[1])
+    return inter / max(area_a + area_b - inter, 1e-6)
+
+
+class Trilha:
+    """ Estado de uma placa acompanhada ao longo dos frames. """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, quad, indice_frame: int):
+        self.id = next(Trilha._ids)
+        self.quad = np.asarray(quad, dtype=np.float32)
+        self.caixa = _caixa(quad)
+        self.primeiro_frame = self.ultimo_frame = indice_frame
+        self.frames = 1
+        self.perdidos = 0
+        self.ocr_feitos = 0
+        self.melhor_qualidade = 0.0
+        # Melhores recortes da janela atual: dicts com "qualidade", "crop", "frame", "quad", "data", "indice"
+        self.buffer = []
+        self.observados = 0
+        # Leituras válidas: dicts com "placa", "padrao", "peso" e o que for preciso para persistir
+        self.leituras = []
+
+    def atualizar(self, quad, indice_frame: int):
+        self.quad = np.asarray(quad, dtype=np.float32)
+        self.caixa = _caixa(quad)
+        self.ultimo_frame = indice_frame
+        self.frames += 1
+        self.perdidos = 0
+
+    def observar(self, recorte: dict, config: dict):
+        """ Guarda o recorte se ele estiver entre os `melhores` da janela atual (por "qualidade"). """
+        self.observados += 1
+        self.buffer.append(recorte)
+        self.buffer.sort(key=lambda r: r["qualidade"], reverse=True)
+        del self.buffer[config["melhores"]:]
+
+    def esgotada(self, config: dict) -> bool:
+        """ Trilha que já gastou o OCR a que tinha direito: não precisa mais nem recortar. """
+        return self.ocr_feitos >= config["max_ocr"]
+
+    def fecharJanela(self, config: dict, final: bool = False):
+        """
+        Se a janela encheu (ou a trilha acabou, `final`), esvazia o buffer e devolve os recortes
+        que merecem OCR, do melhor para o pior: sempre, enquanto não houver leitura válida;
+        depois, só se o melhor da janela superar o melhor já lido. Senão devolve [].
+        """
+        if not self.buffer: return []
+        if not final and self.observados < config["janela"]: return []
+        melhores, self.buffer, self.observados = self.buffer, [], 0
+        if self.esgotada(config): return []
+        if self.leituras and melhores[0]["qualidade"] <= self.melhor_qualidade * config["ganho_qualidade"]:
+            return []
+        return melhores
+
+    def registrarOcr(self, recorte: dict, leitura: dict = None):
+        self.ocr_feitos += 1
+        if leitura is not None:
+            self.leituras.append(leitura)
+            self.melhor_qualidade = max(self.melhor_qualidade, recorte["qualidade"])
+
+    def consolidar(self):
+        """
+        Voto por caractere entre as leituras válidas, cada uma pesando a confiança do OCR.
+        Retorna (placa, padrao, melhor_leitura) ou None se a trilha não teve leitura válida.
+        `melhor_leitura` (recorte/frame gravados no banco) é a que mais concorda com a placa votada.
+        """
+        if not self.leituras: return None
+        votos = [{} for _ in range(7)]
+        for leitura in self.leituras:
+            for pos, ch in enumerate(leitura["placa"]):
+                votos[pos][ch] = votos[pos].get(ch, 0.0) + leitura["peso"]
+        placa = "".join(max(v.items(), key=lambda kv: kv[1])[0] for v in votos)
+
+        padrao = None
+        for padrao_regex, nome_padrao in Validacao.padroes_regex:
+            if re.fullmatch(padrao_regex, placa):
+                padrao = nome_padrao; break
+        if padrao is None:
+            # A mistura por posição não formou uma placa válida: fica a leitura de maior peso
+            melhor = max(self.leituras, key=lambda l: l["peso"])
+            return melhor["placa"], melhor["padrao"], melhor
+        melhor = max(self.leituras, key=lambda l: (sum(a == b for a, b in zip(l["placa"], placa)), l["peso"]))
+        return placa, padrao, melhor
+
+
+class RastreadorPlacas:
+    """
+    Associa os quads candidatos de frames consecutivos por IoU (guloso, maior sobreposição
+    primeiro) e mantém uma Trilha por placa. Trilhas sem correspondência por mais de
+    `max_perdidos` frames processados são encerradas e devolvidas para consolidação.
+
+    Uso (por frame):
+        novas_ou_vistas, encerradas = rastreador.atualizar(quads, indice_frame)
+        ...
+        encerradas += rastreador.encerrarTodas()  # fim do vídeo
+    """
+
+    def __init__(self, **parametros):
+        desconhecidos = set(parametros) - set(CONFIG_RASTREAMENTO_PADRAO)
+        if desconhecidos:
+            raise ValueError(f"Parâmetros desconhecidos para o rastreador: {sorted(desconhecidos)}")
+        self.config = {**CONFIG_RASTREAMENTO_PADRAO, **parametros}
+        self.ativas = []
+
+    def _semDuplicados(self, quads):
+        """ Supressão de não-máximos: os quads vêm em ordem de rank, então o primeiro de cada grupo fica. """
+        mantidos = []
+        for quad in quads:
+            caixa = _caixa(quad)
+            if all(iou(caixa, _caixa(q)) <= self.config["iou_duplicado"] for q in mantidos):
+                mantidos.append(quad)
+        return mantidos
+
+    def atualizar(self, quads, indice_frame: int):
+        """
+        `quads`: quads candidatos do frame, em ordem de rank.
+        Retorna (vistas, encerradas): vistas é a lista de (trilha, quad) deste frame
+        (trilhas novas têm frames == 1); encerradas são as trilhas que saíram de cena.
+        """
+        quads = self._semDuplicados([q for q in quads if q is not None])
+        caixas = [_caixa(q) for q in quads]
+        pares = sorted(((iou(t.caixa, c), ti, qi) for ti, t in enumerate(self.ativas) for qi, c in enumerate(caixas)),
+                       reverse=True)
+        trilhas_usadas, quads_usados, vistas = set(), set(), []
+        for sobreposicao, ti, qi in pares:
+            if sobreposicao < self.config["iou_minimo"]: break
+            if ti in trilhas_usadas or qi in quads_usados: continue
+            trilhas_usadas.add(ti); quads_usados.add(qi)
+            self.ativas[ti].atualizar(quads[qi], indice_frame)
+            vistas.append((self.ativas[ti], quads[qi]))
+
+        encerradas, mantidas = [], []
+        for ti, trilha in enumerate(self.ativas):
+            if ti not in trilhas_usadas:
+                trilha.perdidos += 1
+                if trilha.perdidos > self.config["max_perdidos"]:
+                    encerradas.append(trilha); continue
+            mantidas.append(trilha)
+        self.ativas = mantidas
+
+        for qi, quad in enumerate(quads):
+            if qi in quads_usados: continue
+            trilha = Trilha(quad, indice_frame)
+            self.ativas.append(trilha)
+            vistas.append((trilha, quad))
+        return vistas, encerradas
+
+    def encerrarTodas(self):
+        encerradas, self.ativas = self.ativas, []
+        return encerradas
@@ -88,4 +88,22 @@ class Validacao:
         else:
             # Se não tinha hífen/dois pontos, retorna todos os resultados válidos encontrados
             return resultados_possiveis
-        # --- FIM DO FILTRO ---
\ No newline at end of file
+        # --- FIM DO FILTRO ---
+
+    @staticmethod
+    def desambiguarPorCor(placas_validas: list, percent_azul_superior: float, blue_threshold: float = 0.12):
+        """
+        Escolhe uma única placa entre as leituras válidas usando a faixa azul do Mercosul:
+        azul na metade superior acima do limiar -> MERCOSUL, senão -> ANTIGA.
+        Retorna (placa, padrao) ou (None, "INDEFINIDO") se a lista estiver vazia.
+        """
+        if not placas_validas:
+            return None, "INDEFINIDO"
+        if len(placas_validas) == 1:
+            return placas_validas[0]
+
+        padrao_preferido = "MERCOSUL" if percent_azul_superior > blue_threshold else "ANTIGA"
+        for placa, padrao in placas_validas:
+            if padrao == padrao_preferido:
+                return placa, padrao
+        return placas_validas[0] # Fallback
@@ -0,0 +1,87 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.config.db import Base
+from src.controllers import placaController
+from src.controllers.placaController import PlacaController
+from src.models.acessoModel import TabelaAcesso
+from src.services import armazenamentoImagens, persistencia
+from src.services.armazenamentoImagens import ArmazenamentoImagens
+from src.services.persistencia import Persistencia
+
+
+class _SessaoCommitFalha(Session):
+    def commit(self):
+        raise RuntimeError("disco cheio")
+
+
+class ExcluirRegistroTest(unittest.TestCase):
+    """ excluirRegistro x arquivos de imagem compartilhados (endereçados pelo hash). """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        raiz = Path(self._tmp.name)
+        diretorios = {tipo: raiz / tipo for tipo in ("source", "crop", "annotated")}
+        for diretorio in diretorios.values():
+            diretorio.mkdir()
+        self.engine = create_engine(f"sqlite:///{raiz / 'placas.db'}")
+        Base.metadata.create_all(bind=self.engine)
+        self.sessao = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        for alvo in (mock.patch.object(armazenamentoImagens, "DIRETORIOS", diretorios),
+                     mock.patch.object(placaController, "SessionLocal", self.sessao),
+                     mock.patch.object(persistencia, "SessionLocal", self.sessao)):
+            alvo.start()
+            self.addCleanup(alvo.stop)
+        self.imagem = np.full((40, 80, 3), 120, dtype=np.uint8)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self._tmp.cleanup()
+
+    def _salvar(self):
+        Persistencia.salvar("ABC1D23", 0.9, self.imagem, self.imagem, self.imagem)
+        db = self.sessao()
+        try:
+            registro = db.query(TabelaAcesso).order_by(TabelaAcesso.id.desc()).first()
+            return registro.id, {"source": registro.source_hash, "crop": registro.crop_hash,
+                                 "annotated": registro.annotated_hash}
+        finally:
+            db.close()
+
+    def _existem(self, hashes):
+        return all(ArmazenamentoImagens.caminho(tipo, h).exists() for tipo, h in hashes.items())
+
+    def test_commit_falho_mantem_registro_e_arquivos(self):
+        registro_id, hashes = self._salvar()
+        with mock.patch.object(placaController, "SessionLocal",
+                               sessionmaker(bind=self.engine, class_=_SessaoCommitFalha)):
+            self.assertFalse(PlacaController.excluirRegistro(registro_id))
+
+        db = self.sessao()
+        try:
+            self.assertIsNotNone(db.get(TabelaAcesso, registro_id))
+        finally:
+            db.close()
+        self.assertTrue(self._existem(hashes))
+
+    def test_arquivo_compartilhado_so_sai_com_o_ultimo_registro(self):
+        primeiro_id, hashes = self._salvar()
+        segundo_id, hashes_segundo = self._salvar()
+        self.assertEqual(hashes, hashes_segundo)
+
+        self.assertTrue(PlacaController.excluirRegistro(primeiro_id))
+        self.assertTrue(self._existem(hashes))
+
+        self.assertTrue(PlacaController.excluirRegistro(segundo_id))
+        for tipo, h in hashes.items():
+            self.assertFalse(ArmazenamentoImagens.caminho(tipo, h).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()